@@ -0,0 +1,83 @@
+"""Measure how convert() scales across threads and processes
+
+Converts the extended test fixtures over and over with a growing number of
+workers and prints the throughput for each worker count. Threads only scale
+on a free-threaded (no-GIL) build of Python, processes scale everywhere.
+
+    python benchmarks/scaling.py --documents 2000 --workers 1 2 4 8
+"""
+import argparse
+import glob
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from html2kirby import convert  # noqa: E402
+
+FIXTURES = os.path.join(HERE, os.pardir, "tests", "extended_tests", "*.html")
+
+
+def gil_enabled():
+    """Whether the running interpreter has the GIL enabled"""
+    is_gil_enabled = getattr(sys, "_is_gil_enabled", None)
+    return is_gil_enabled() if is_gil_enabled is not None else True
+
+
+def load_documents(count):
+    documents = []
+
+    for filename in sorted(glob.glob(FIXTURES)):
+        with open(filename, 'r') as f:
+            documents.append(f.read())
+
+    return [documents[i % len(documents)] for i in range(count)]
+
+
+def run(executor_class, workers, documents):
+    with executor_class(max_workers=workers) as executor:
+        # warm up the pool so that process start up isn't measured
+        list(executor.map(convert, documents[:workers]))
+
+        start = time.perf_counter()
+        list(executor.map(convert, documents, chunksize=16))
+        return time.perf_counter() - start
+
+
+def report(name, executor_class, worker_counts, documents):
+    baseline = None
+
+    for workers in worker_counts:
+        elapsed = run(executor_class, workers, documents)
+        baseline = baseline or elapsed
+        print("{:<10} {:>3} workers {:>10.0f} docs/s {:>6.2f}x".format(
+            name, workers, len(documents) / elapsed, baseline / elapsed
+        ))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+",
+                        default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    documents = load_documents(args.documents)
+
+    print("Python {} (GIL {})".format(
+        sys.version.split()[0], "enabled" if gil_enabled() else "disabled"
+    ))
+
+    if gil_enabled():
+        print("Threads won't scale with the GIL enabled, use a free-threaded "
+              "build (python3.13t or newer) to measure thread scaling")
+
+    report("threads", ThreadPoolExecutor, args.workers, documents)
+    report("processes", ProcessPoolExecutor, args.workers, documents)
+
+
+if __name__ == "__main__":
+    main()
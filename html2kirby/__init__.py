@@ -1,5 +1,9 @@
-from .html2kirby import HTML2Kirby
+from .cache import FragmentCache
+from .html2kirby import HTML2Kirby, MemoryStats, convert
 
 __all__ = [
-    'HTML2Kirby'
+    'FragmentCache',
+    'HTML2Kirby',
+    'MemoryStats',
+    'convert',
 ]
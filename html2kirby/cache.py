@@ -0,0 +1,114 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+__all__ = ["FragmentCache"]
+
+
+class FragmentCache:
+    """Cache of converted html fragments
+
+    Pages often share large identical fragments (footers, share widgets,
+    svg icons). When a parser is given a FragmentCache, it looks up every
+    top-level block and passthrough subtree by a hash of its raw html and
+    reuses the kirbytext instead of converting the fragment again.
+
+    The cache can be shared between parsers, also across threads, to reuse
+    fragments between the documents of a batch. Only fragments between
+    min_fragment_size and max_fragment_size characters of html are cached,
+    and only once they've been seen twice, so unique fragments don't cost
+    an extra conversion. The least recently used fragments are evicted once
+    there are more than maxsize fragments or their kirbytext is longer than
+    max_chars characters in total.
+    """
+    def __init__(self, maxsize=4096, max_chars=4 * 1024 * 1024,
+                 min_fragment_size=256, max_fragment_size=64 * 1024):
+        self.maxsize = maxsize
+        self.max_chars = max_chars
+        self.min_fragment_size = min_fragment_size
+        self.max_fragment_size = max_fragment_size
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._entries = OrderedDict()
+        self._seen = OrderedDict()
+        self._chars = 0
+        self._lock = threading.Lock()
+
+    def key(self, profile, context, html):
+        """Build the cache key of a fragment
+
+        The key contains the converter class, since it defines the
+        conversion, and the context the fragment is written in, since the
+        kirbytext depends on what has been written before.
+        """
+        digest = hashlib.sha1(html.encode('utf-8', 'surrogatepass')).digest()
+
+        return (profile, context, len(html), digest)
+
+    def get(self, key):
+        """Get the kirbytext of a fragment, None if it's not cached"""
+        with self._lock:
+            kirbytext = self._entries.get(key)
+
+            if kirbytext is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self._entries.move_to_end(key)
+
+            return kirbytext
+
+    def admit(self, key):
+        """Whether a fragment that isn't cached yet should be
+
+        Only fragments that have been seen before are admitted, the keys of
+        the last 4 * maxsize fragments seen once are remembered.
+        """
+        with self._lock:
+            if self._seen.pop(key, None) is not None:
+                return True
+
+            self._seen[key] = True
+            if len(self._seen) > 4 * self.maxsize:
+                self._seen.popitem(last=False)
+
+            return False
+
+    def put(self, key, kirbytext):
+        with self._lock:
+            if key in self._entries:
+                return
+
+            self._entries[key] = kirbytext
+            self._chars += len(kirbytext)
+
+            while (len(self._entries) > self.maxsize
+                   or self._chars > self.max_chars):
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._seen.clear()
+            self._chars = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def stats(self):
+        lookups = self.hits + self.misses
+
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hits / lookups if lookups else 0.0,
+            'fragments': len(self._entries),
+            'chars': self._chars,
+        }
@@ -0,0 +1,244 @@
+"""Command line interface
+
+    python -m html2kirby convert [--memory-stats] [FILE ...]
+    python -m html2kirby serve [--port PORT | --socket PATH]
+    python -m html2kirby pack DIRECTORY PACK
+    python -m html2kirby convert-pack SOURCE DESTINATION
+    python -m html2kirby unpack PACK DIRECTORY
+    python -m html2kirby watch SOURCE DESTINATION
+    python -m html2kirby replay RECORDING
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+
+from .cache import FragmentCache
+from .html2kirby import HTML2Kirby
+
+
+def convert_file(formatter, html_file, chunk_size=64 * 1024):
+    # read in chunks, so the rest of the file isn't read once an excerpt
+    # is complete
+    for chunk in iter(lambda: html_file.read(chunk_size), ''):
+        formatter.feed(chunk)
+
+        if formatter.excerpt_complete:
+            break
+
+    formatter.close()
+
+    return formatter.kirbytext
+
+
+def output_path(filename, output_dir):
+    name = os.path.splitext(os.path.basename(filename))[0] + ".txt"
+
+    return os.path.join(output_dir, name)
+
+
+def command_convert(args):
+    """Convert the given files (or stdin) and print the kirbytext
+
+    With --output-dir, each file is written to a .txt file with the same name
+    in that directory instead. With --memory-stats, a JSON line with the
+    memory usage of each conversion is printed to stderr. With
+    --fragment-cache, fragments repeated between the files are only
+    converted once and the cache statistics are printed to stderr. With
+    --excerpt-chars or --excerpt-blocks, only the beginning of each file is
+    converted.
+    """
+    sources = args.files or ['-']
+    cache = FragmentCache() if args.fragment_cache else None
+
+    for filename in sources:
+        formatter = HTML2Kirby(track_memory=args.memory_stats,
+                               fragment_cache=cache,
+                               excerpt_chars=args.excerpt_chars,
+                               excerpt_blocks=args.excerpt_blocks)
+
+        if filename == '-':
+            kirbytext = convert_file(formatter, sys.stdin)
+        else:
+            with open(filename, 'r') as html_file:
+                kirbytext = convert_file(formatter, html_file)
+
+        if args.output_dir and filename != '-':
+            with open(output_path(filename, args.output_dir), 'w') as f:
+                f.write(kirbytext)
+        else:
+            sys.stdout.write(kirbytext)
+
+        if args.memory_stats:
+            stats = dict(file=filename, **formatter.memory_stats.as_dict())
+            print(json.dumps(stats), file=sys.stderr)
+
+    if cache is not None:
+        print(json.dumps(dict(fragment_cache=cache.stats)), file=sys.stderr)
+
+
+def command_serve(args):
+    """Run a conversion server with a pool of warm workers"""
+    from .server import make_server
+
+    server = make_server(host=args.host, port=args.port,
+                         socket_path=args.socket, workers=args.workers,
+                         timeout=args.timeout, idle_timeout=args.idle_timeout)
+
+    print("Listening on {}".format(args.socket or "http://{}:{}".format(
+        *server.server_address)), file=sys.stderr)
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+def command_pack(args):
+    """Pack the html files of a directory"""
+    from .pack import pack_directory
+
+    count = pack_directory(args.directory, args.pack)
+    print("Packed {} documents".format(count), file=sys.stderr)
+
+
+def command_unpack(args):
+    """Write the documents of a pack to a directory"""
+    from .pack import unpack
+
+    count = unpack(args.pack, args.directory)
+    print("Unpacked {} documents".format(count), file=sys.stderr)
+
+
+def command_convert_pack(args):
+    """Convert the documents of a pack into another pack"""
+    from .pack import convert_pack
+
+    cache = FragmentCache() if args.fragment_cache else None
+    count = convert_pack(args.source, args.destination, fragment_cache=cache)
+    print("Converted {} documents".format(count), file=sys.stderr)
+
+    if cache is not None:
+        print(json.dumps(dict(fragment_cache=cache.stats)), file=sys.stderr)
+
+
+def command_watch(args):
+    """Convert the html files of a directory whenever they change"""
+    from .watch import Watcher
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    watcher = Watcher(args.source, args.destination, interval=args.interval,
+                      debounce=args.debounce, workers=args.workers)
+
+    try:
+        watcher.run()
+    except KeyboardInterrupt:
+        pass
+
+
+def command_replay(args):
+    """Replay a recorded session and report its timings"""
+    from .replay import replay
+
+    if args.cprofile:
+        import cProfile
+        import pstats
+
+        profiler = cProfile.Profile()
+        report = profiler.runcall(replay, args.recording, repeat=args.repeat)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats(
+            'cumulative').print_stats(20)
+    else:
+        report = replay(args.recording, repeat=args.repeat)
+
+    print(report)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(
+        prog='html2kirby', description='A HTML to Kirbytext converter'
+    )
+    commands = parser.add_subparsers(dest='command')
+    commands.required = True
+
+    convert = commands.add_parser('convert', help=command_convert.__doc__
+                                  .split("\n")[0])
+    convert.add_argument('files', nargs='*', metavar='FILE',
+                         help="html files to convert, - for stdin")
+    convert.add_argument('-d', '--output-dir',
+                         help="write a .txt file per input to this directory")
+    convert.add_argument('--memory-stats', action='store_true',
+                         help="print the memory usage per file to stderr")
+    convert.add_argument('--fragment-cache', action='store_true',
+                         help="convert fragments repeated between the files "
+                              "only once")
+    convert.add_argument('--excerpt-chars', type=int, metavar='N',
+                         help="stop after N characters of kirbytext")
+    convert.add_argument('--excerpt-blocks', type=int, metavar='N',
+                         help="stop after N top-level blocks")
+    convert.set_defaults(func=command_convert)
+
+    serve = commands.add_parser('serve', help=command_serve.__doc__)
+    serve.add_argument('--host', default='127.0.0.1')
+    serve.add_argument('--port', type=int, default=8009)
+    serve.add_argument('--socket', metavar='PATH',
+                       help="listen on a Unix socket instead")
+    serve.add_argument('--workers', type=int,
+                       help="number of worker processes, one per CPU by "
+                            "default")
+    serve.add_argument('--timeout', type=float, default=30,
+                       help="seconds a conversion may take")
+    serve.add_argument('--idle-timeout', type=float, default=60,
+                       help="seconds before idle connections are closed")
+    serve.set_defaults(func=command_serve)
+
+    pack = commands.add_parser('pack', help=command_pack.__doc__)
+    pack.add_argument('directory')
+    pack.add_argument('pack')
+    pack.set_defaults(func=command_pack)
+
+    convert_pack = commands.add_parser('convert-pack',
+                                       help=command_convert_pack.__doc__)
+    convert_pack.add_argument('source')
+    convert_pack.add_argument('destination')
+    convert_pack.add_argument('--fragment-cache', action='store_true',
+                              help="convert fragments repeated between the "
+                                   "documents only once")
+    convert_pack.set_defaults(func=command_convert_pack)
+
+    unpack = commands.add_parser('unpack', help=command_unpack.__doc__)
+    unpack.add_argument('pack')
+    unpack.add_argument('directory')
+    unpack.set_defaults(func=command_unpack)
+
+    watch = commands.add_parser('watch', help=command_watch.__doc__)
+    watch.add_argument('source')
+    watch.add_argument('destination')
+    watch.add_argument('--interval', type=float, default=0.5,
+                       help="seconds between polling for changes")
+    watch.add_argument('--debounce', type=float, default=0.3,
+                       help="seconds changes need to settle before "
+                            "converting")
+    watch.add_argument('--workers', type=int, default=2,
+                       help="number of worker processes")
+    watch.set_defaults(func=command_watch)
+
+    replay = commands.add_parser('replay', help=command_replay.__doc__)
+    replay.add_argument('recording')
+    replay.add_argument('--repeat', type=int, default=1,
+                        help="replay this many times and report the fastest")
+    replay.add_argument('--cprofile', action='store_true',
+                        help="print cProfile statistics to stderr")
+    replay.set_defaults(func=command_replay)
+
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    return args.func(args)
@@ -1,21 +1,122 @@
 import logging
+import re
+import tracemalloc
 from html import unescape
 from html.parser import HTMLParser
 
-__all__ = ["HTML2Kirby"]
+__all__ = ["HTML2Kirby", "MemoryStats", "convert"]
+
+
+class TextBuffer:
+    """Text that is only ever appended to
+
+    Appending to a str attribute copies the whole string every time, which
+    makes building a large text quadratic. The buffer keeps the appended
+    chunks and only joins them when the text is read. The last few
+    characters are kept apart, so checking the end of the text is cheap.
+    """
+    tail_size = 8
+
+    def __init__(self, text=''):
+        self._chunks = [text] if text else []
+        self._length = len(text)
+        self._tail = text[-self.tail_size:]
+
+    def append(self, text):
+        if not text:
+            return
+
+        self._chunks.append(text)
+        self._length += len(text)
+
+        if len(text) >= self.tail_size:
+            self._tail = text[-self.tail_size:]
+        else:
+            self._tail = (self._tail + text)[-self.tail_size:]
+
+    def endswith(self, suffix):
+        if len(suffix) <= len(self._tail) or len(self._tail) == self._length:
+            return self._tail.endswith(suffix)
+
+        return self.getvalue().endswith(suffix)
+
+    def getvalue(self):
+        if len(self._chunks) > 1:
+            self._chunks = ["".join(self._chunks)]
+
+        return self._chunks[0] if self._chunks else ''
+
+    def __len__(self):
+        return self._length
 
 
 class StackEntry:
     def __init__(self, tag, attrs):
         self.tag = tag
         self.attrs = attrs
-        self.data = ''
+        self.buffer = TextBuffer()
+
+    @property
+    def data(self):
+        return self.buffer.getvalue()
 
     def add_data(self, data):
-        self.data += data
+        self.buffer.append(data)
+
+
+_starttag_name = re.compile(r'<([a-zA-Z][^\t\n\r\f />\x00]*)')
+
+_element_boundaries = {}
+
+_last_whitespace = re.compile(r'.*\s', re.DOTALL)
+
+_void_tags = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+))
+
+
+class ExcerptComplete(Exception):
+    """Raised inside the parser to stop it once the excerpt is complete"""
+
+
+class MemoryStats:
+    """Memory usage of a single conversion
+
+    peak_memory is the peak of memory allocated while feeding the parser in
+    bytes, as measured by tracemalloc. max_stack_depth is the deepest the tag
+    stack got, max_frame_size the size of the largest StackEntry.data buffer
+    and output_size the size of the resulting kirbytext.
+    """
+    def __init__(self):
+        self.peak_memory = 0
+        self.max_stack_depth = 0
+        self.max_frame_size = 0
+        self.output_size = 0
+
+    def as_dict(self):
+        return {
+            'peak_memory': self.peak_memory,
+            'max_stack_depth': self.max_stack_depth,
+            'max_frame_size': self.max_frame_size,
+            'output_size': self.output_size,
+        }
+
+    def __repr__(self):
+        return "MemoryStats({})".format(", ".join(
+            "{}={}".format(*item) for item in self.as_dict().items()
+        ))
 
 
 class TagStack(list):
+    def __init__(self):
+        super().__init__()
+
+        self.max_depth = 0
+        self.max_frame_size = 0
+
+        self._tag_counts = {}
+
     def push(self, tag, attrs):
         """Record a tag
 
@@ -25,22 +126,31 @@ class TagStack(list):
         is inbetween
         """
         self.append(StackEntry(tag=tag, attrs=dict(attrs)))
+        self.max_depth = max(self.max_depth, len(self))
+        self._tag_counts[tag] = self._tag_counts.get(tag, 0) + 1
 
     def add_data(self, data):
         """Add data to the current state we're in"""
-        last = self.peek()
-        last.data += data
+        self.peek().add_data(data)
 
     def peek(self):
         """Have a look at the current state without removing it"""
         return self[-1]
 
     def pop(self):
-        return super().pop()
+        entry = super().pop()
+        self.max_frame_size = max(self.max_frame_size, len(entry.buffer))
+        self._tag_counts[entry.tag] -= 1
+
+        return entry
 
     def is_empty(self):
         return len(self) == 0
 
+    def count_tag(self, tag):
+        """Number of open states of tag, without scanning the stack"""
+        return self._tag_counts.get(tag, 0)
+
 
 class HTML2Kirby(HTMLParser):
     tag_map = {
@@ -79,16 +189,103 @@ class HTML2Kirby(HTMLParser):
         'table'
     )
 
-    _passthrough_levels = 0
-    """Passthrough mode is triggered by self.passthrough_tags and
-    will directly output this tag and all children instead of converting them
-    to kirbytext
+    skip_tags = (
+        'script',
+        'style',
+        'noscript',
+        'iframe',
+        'template',
+        'object',
+        'head',
+    )
+    """Tags that are dropped together with all of their content"""
+
+    head_tags = (
+        'title',
+        'base',
+        'link',
+        'meta',
+        'style',
+        'script',
+        'noscript',
+        'template',
+    )
+    """Tags that can be in the <head>, any other tag ends it
+
+    The </head> end tag can be left out, in which case the head ends
+    before the first tag that can't be in it, e.g. <body>.
     """
 
-    def __init__(self, *args, **kwargs):
+    fragment_tags = (
+        'div',
+        'section',
+        'article',
+        'aside',
+        'header',
+        'footer',
+        'nav',
+        'figure',
+        'form',
+        'ul',
+        'ol',
+        'blockquote',
+    )
+    """Block tags that are looked up in the fragment cache, in addition to
+    the passthrough tags
+    """
+
+    block_tags = (
+        'p',
+        'h1',
+        'h2',
+        'h3',
+        'h4',
+        'h5',
+        'h6',
+        'ul',
+        'ol',
+        'pre',
+        'blockquote',
+        'hr',
+        'table',
+        'svg',
+    )
+    """Tags that count as a block for excerpt_blocks"""
+
+    line_break_tags = block_tags + (
+        'br',
+        'li',
+        'div',
+        'section',
+        'article',
+        'header',
+        'footer',
+        'figure',
+        'figcaption',
+        'tr',
+        'td',
+        'th',
+    )
+    """Tags that start a new line in the plaintext"""
+
+    def __init__(self, *args, track_memory=False, fragment_cache=None,
+                 excerpt_chars=None, excerpt_blocks=None, collect_extras=False,
+                 **kwargs):
         super().__init__(*args, **kwargs)
 
+        self._init_args = (args, dict(kwargs, track_memory=track_memory,
+                                      fragment_cache=fragment_cache,
+                                      excerpt_chars=excerpt_chars,
+                                      excerpt_blocks=excerpt_blocks,
+                                      collect_extras=collect_extras))
+
         self.kirbytext = ""
+
+        self._passthrough_levels = 0
+        """Passthrough mode is triggered by self.passthrough_tags and
+        will directly output this tag and all children instead of converting
+        them to kirbytext
+        """
         self.start_tag_handlers = [t for t in dir(self)
                                    if t.startswith("process_start_")]
 
@@ -98,14 +295,477 @@ class HTML2Kirby(HTMLParser):
 
         self.tag_stack = TagStack()
 
+        self.track_memory = track_memory
+        """Whether to record the memory usage in self.memory_stats"""
+
+        self._peak_memory = 0
+        self._memory_retained = 0
+        self._memory_start = 0
+        self._peak_valid = False
+        self._started_tracemalloc = False
+
+        self.fragment_cache = fragment_cache
+        """FragmentCache to reuse the kirbytext of repeated fragments"""
+
+        self._fragment_blocks = []
+        """For every open fragment_tag, whether the blocks in it are looked
+        up in the fragment_cache. Only tracked with a fragment_cache.
+        """
+
+        self._lookup_children = False
+
+        self._skip_tag = None
+        self._skip_levels = 0
+
+        self._text_run = []
+        """Data of the current text run, see handle_data()"""
+
+        self.excerpt_chars = excerpt_chars
+        """Stop converting once this many characters are written"""
+
+        self.excerpt_blocks = excerpt_blocks
+        """Stop converting once this many top-level blocks are written"""
+
+        self.excerpt_complete = False
+        """Whether the conversion was stopped since the excerpt is complete"""
+
+        self._blocks = 0
+        self._excerpt_truncated = False
+
+        self._open_html = []
+        """Tags that were written as html and are still open"""
+
+        self.collect_extras = collect_extras
+        """Whether to collect the plaintext, images and links as well"""
+
+        self._plaintext = TextBuffer()
+        self._plaintext_space = False
+
+        self.images = []
+        """Sources of the images, if collect_extras is enabled"""
+
+        self.links = []
+        """Targets of the links, if collect_extras is enabled"""
+
     def _reset(self):
-        self.__init__()
+        args, kwargs = self._init_args
+        self.__init__(*args, **kwargs)
+
+    def feed(self, data):
+        if self.excerpt_complete:
+            return
+
+        if self.track_memory:
+            self._start_memory_trace()
+
+        try:
+            super().feed(data)
+        except ExcerptComplete:
+            self.finish_excerpt()
+        finally:
+            # also if the conversion failed, so tracing is stopped
+            if self.track_memory:
+                self._end_memory_trace()
+
+    def close(self):
+        if self.track_memory:
+            self._start_memory_trace()
+
+        try:
+            if not self.excerpt_complete:
+                super().close()
+                self.end_text_run()
+                self.check_excerpt()
+        except ExcerptComplete:
+            self.finish_excerpt()
+        finally:
+            if self.track_memory:
+                self._end_memory_trace()
+
+    @property
+    def is_excerpt(self):
+        """Whether only an excerpt of the document is converted"""
+        return (self.excerpt_chars is not None
+                or self.excerpt_blocks is not None)
+
+    def check_excerpt(self):
+        """Stop the parser if the excerpt is complete
+
+        The characters written to the kirbytext and to the open states are
+        counted, so a single large list or quote doesn't run over.
+        """
+        if not self.is_excerpt or self.excerpt_complete:
+            return
+
+        if (self.excerpt_blocks is not None
+                and self._blocks >= self.excerpt_blocks):
+            raise ExcerptComplete()
+
+        if self.excerpt_chars is not None:
+            if (self._excerpt_truncated
+                    or self.written() >= self.excerpt_chars):
+                raise ExcerptComplete()
+
+    def written(self):
+        """Number of characters written to the kirbytext and open states"""
+        return len(self._kirbytext) + sum(
+            len(entry.buffer) for entry in self.tag_stack)
+
+    def truncate_excerpt(self, data):
+        """Cut text that doesn't fit in the excerpt
+
+        The text is cut at the last whitespace that fits, or right at the
+        limit if there's none (e.g. in languages without spaces).
+        """
+        remaining = max(self.excerpt_chars - self.written(), 0)
+
+        if len(data) <= remaining:
+            return data
+
+        # the text is cut, so the excerpt is complete even if it's short
+        self._excerpt_truncated = True
+
+        match = _last_whitespace.match(data, 0, remaining + 1)
+        cut = match.end() - 1 if match else remaining
+
+        return data[:cut]
+
+    def finish_excerpt(self):
+        """Drop the rest of the input and close all open tags
+
+        Closing the open tags writes their states, so the excerpt is valid
+        kirbytext.
+        """
+        self.excerpt_complete = True
+        self.rawdata = ''
+        self._text_run = []
+        self._skip_levels = 0
+
+        for tag in reversed(self._open_html):
+            self.handle_endtag(tag)
+
+        while not self.tag_stack.is_empty():
+            depth = len(self.tag_stack)
+            self.handle_endtag(self.tag_stack.peek().tag)
+
+            if len(self.tag_stack) == depth:
+                # the tag doesn't close its state, keep its text
+                self.o(self.tag_stack.pop().data)
+
+    def _start_memory_trace(self):
+        """Start measuring the allocations of a feed() or close() call
+
+        The peak is measured relative to the memory allocated before the
+        first call, counting what the previous calls kept allocated.
+        tracemalloc is process wide, so the peak is only meaningful if
+        there's a single traced conversion running at a time.
+        """
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracemalloc = True
+
+        if hasattr(tracemalloc, 'reset_peak'):
+            tracemalloc.reset_peak()
+            self._peak_valid = True
+        else:
+            # before python 3.9, the peak is only reset by starting to trace
+            self._peak_valid = self._started_tracemalloc
+
+        self._memory_start = tracemalloc.get_traced_memory()[0]
+
+    def _end_memory_trace(self):
+        """Record the peak of the call and stop tracing if we started it
+
+        Tracing is stopped after every call, so it doesn't keep slowing
+        down the process if close() is never called.
+        """
+        current, peak = tracemalloc.get_traced_memory()
+
+        if not self._peak_valid:
+            # the peak could be from before the call, only the memory still
+            # allocated at its end is known to be ours
+            peak = current
+
+        self._peak_memory = max(
+            self._peak_memory,
+            self._memory_retained + peak - self._memory_start)
+        self._memory_retained += current - self._memory_start
+
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    @property
+    def memory_stats(self):
+        """Memory usage of the conversion so far
+
+        The peak memory is only recorded when track_memory is enabled, the
+        other values are always available.
+        """
+        stats = MemoryStats()
+        stats.peak_memory = self._peak_memory
+        stats.max_stack_depth = self.tag_stack.max_depth
+        stats.max_frame_size = max(
+            [self.tag_stack.max_frame_size]
+            + [len(entry.buffer) for entry in self.tag_stack]
+        )
+        stats.output_size = len(self._kirbytext)
+
+        return stats
+
+    def parse_starttag(self, i):
+        """Parse the start tag at self.rawdata[i]
+
+        If the whole element is already in the buffer, the parser can skip
+        right to the end of the element, either because it's one of the
+        skip_tags or because we're using a fragment cache and its cached
+        kirbytext is written instead.
+        """
+        self.end_text_run()
+
+        tag = _starttag_name.match(self.rawdata, i).group(1).lower()
+
+        if tag in self.skip_tags:
+            # the head can end before </head> (see head_tags), so it's
+            # skipped tag by tag
+            if (tag != 'head' and not self.is_passthrough
+                    and not self.is_skipping):
+                end = self.find_element_end(i, tag)
+                if end > 0:
+                    return end
+
+        elif (self.fragment_cache is not None and not self.is_excerpt
+                and not self.collect_extras):
+            # cached fragments are written at once, so the excerpt
+            # couldn't end within them. Only their kirbytext is cached,
+            # not their extras.
+            end = self.write_cached_fragment(i, tag)
+            if end > 0:
+                return end
+
+        return super().parse_starttag(i)
+
+    def find_element_end(self, i, tag, max_length=None):
+        """Find the end of the element starting at self.rawdata[i]
+
+        Returns the position after the matching end tag, or -1 if the end
+        tag isn't within max_length characters in the buffer (yet).
+        """
+        rawdata = self.rawdata
+        if max_length is None:
+            max_length = len(rawdata)
+
+        starttag_end = self.check_for_whole_start_tag(i)
+        if (tag in _void_tags or starttag_end < 0
+                or rawdata.startswith('/>', starttag_end - 2)):
+            return -1
+
+        cdata = tag in self.CDATA_CONTENT_ELEMENTS
+        pattern = _element_boundaries.get(tag)
+        if pattern is None:
+            boundary = r'<(/?){}(?=[\s/>])'.format(re.escape(tag))
+            if not cdata:
+                # tags in comments don't count, an unterminated comment
+                # only matches its <!--
+                boundary = r'<!--(?:.*?-->)?|' + boundary
+
+            pattern = re.compile(boundary, re.IGNORECASE | re.DOTALL)
+            _element_boundaries[tag] = pattern
+
+        depth = 1
+
+        for match in pattern.finditer(rawdata, starttag_end, i + max_length):
+            if match.group(1) is None:
+                if match.end() - match.start() == 4:
+                    # the end of the comment isn't in the buffer yet
+                    return -1
+                continue
+
+            if match.group(1):
+                depth -= 1
+            elif not cdata:
+                # the content of <script> and <style> isn't html, so
+                # it can't contain nested elements
+                depth += 1
+
+            if depth == 0:
+                end = rawdata.find('>', match.end())
+                return end + 1 if end >= 0 else -1
+
+        return -1
+
+    def fragment_context(self):
+        """The context the next fragment would be written in
+
+        A fragment's kirbytext only depends on whether we're in a state or
+        on the end of the kirbytext written so far, see p(), tag_pad(),
+        tag_start_of_line() and o(). None if fragments can't be cached here.
+        """
+        if self.is_passthrough or self.is_skipping:
+            return None
+
+        if not self.tag_stack.is_empty():
+            return 'state'
+
+        for context in ("\n\n", "\n", " "):
+            if self._kirbytext.endswith(context):
+                return context
+
+        return "." if len(self._kirbytext) else ""
+
+    def convert_fragment(self, html, context):
+        """Convert a fragment in a new parser set up in the given context
+
+        Returns None if the fragment isn't self-contained, i.e. if it
+        leaves the parser in a different state than it started in.
+        """
+        args, kwargs = self._init_args
+        kwargs = dict(kwargs, track_memory=False, fragment_cache=None,
+                      excerpt_chars=None, excerpt_blocks=None)
+
+        fragment = type(self)(*args, **kwargs)
+
+        if context == 'state':
+            fragment.tag_stack.push('', [])
+        else:
+            fragment.kirbytext = context
+
+        fragment.feed(html)
+
+        if (fragment.rawdata or fragment.cdata_elem or fragment.is_passthrough
+                or len(fragment.tag_stack) != (context == 'state')):
+            return None
+
+        if context == 'state':
+            return fragment.tag_stack.peek().data
+
+        return fragment.kirbytext[len(context):]
+
+    def write_cached_fragment(self, i, tag):
+        """Write the element at self.rawdata[i] from the fragment cache
+
+        Top-level blocks (see fragment_tags) and passthrough subtrees are
+        cached. If a block isn't written from the cache, the blocks directly
+        in it are looked up in turn, so pages wrapped in a container still
+        share their footers. A fragment is only converted for the cache when
+        it's seen the second time, otherwise it's parsed as usual. Returns
+        the position after the element or -1 if it wasn't written.
+        """
+        cache = self.fragment_cache
+        self._lookup_children = False
+
+        if tag in self.passthrough_tags:
+            context = self.fragment_context()
+        elif (tag in self.fragment_tags and self.tag_stack.is_empty()
+                and (not self._fragment_blocks or self._fragment_blocks[-1])):
+            context = self.fragment_context()
+        else:
+            return -1
+
+        if context is None:
+            return -1
+
+        end = self.find_element_end(i, tag, cache.max_fragment_size)
+        if end >= 0 and end - i < cache.min_fragment_size:
+            # the blocks in it are even smaller
+            return -1
+
+        self._lookup_children = True
+
+        if end < 0:
+            return -1
+
+        html = self.rawdata[i:end]
+        key = cache.key(type(self), context, html)
+        kirbytext = cache.get(key)
+
+        if kirbytext is None:
+            if not cache.admit(key):
+                return -1
+
+            kirbytext = self.convert_fragment(html, context)
+            if kirbytext is None:
+                return -1
+
+            cache.put(key, kirbytext)
+
+        if context == 'state':
+            self.tag_stack.add_data(kirbytext)
+        else:
+            self._kirbytext.append(kirbytext)
+
+        return end
+
+    @property
+    def kirbytext(self):
+        """The kirbytext converted so far
+
+        Reading it ends the current text run, so if more text is fed
+        afterwards, it's handled as if there was a tag in between.
+        """
+        self.end_text_run()
+        return self._kirbytext.getvalue()
+
+    @kirbytext.setter
+    def kirbytext(self, kirbytext):
+        self._kirbytext = TextBuffer(kirbytext)
+
+    @property
+    def plaintext(self):
+        """The text without any markup, if collect_extras is enabled
+
+        Whitespace is collapsed, blocks (see line_break_tags) are on
+        lines of their own.
+        """
+        self.end_text_run()
+        return self._plaintext.getvalue()
+
+    def text(self, data):
+        """Append text to the plaintext, collapsing whitespace"""
+        words = data.split()
+
+        if data[:1].isspace():
+            self._plaintext_space = True
+
+        if words:
+            if (self._plaintext_space and len(self._plaintext)
+                    and not self._plaintext.endswith("\n")):
+                self._plaintext.append(" ")
+
+            self._plaintext.append(" ".join(words))
+            self._plaintext_space = data[-1:].isspace()
+
+    def text_line_break(self):
+        """Start a new line in the plaintext, if it's not empty"""
+        if len(self._plaintext) and not self._plaintext.endswith("\n"):
+            self._plaintext.append("\n")
+
+        self._plaintext_space = False
+
+    def collect_html_extras(self, tag, attrs):
+        """Collect images and links of tags written as html"""
+        if tag == 'img' or tag == 'a':
+            attrs = dict(attrs)
+
+            if tag == 'img' and 'src' in attrs:
+                self.images.append(attrs['src'])
+            elif tag == 'a' and 'href' in attrs:
+                self.links.append(attrs['href'])
 
     @property
     def is_passthrough(self):
         """Whether we're in a passthrough mode"""
         return self._passthrough_levels > 0
 
+    @property
+    def is_skipping(self):
+        """Whether we're inside one of the skip_tags
+
+        Only used if the end of the skipped element wasn't in the buffer
+        yet when it started, otherwise the parser jumps right past it.
+        """
+        return self._skip_levels > 0
+
     def enable_passthrough_mode(self):
         """Enable passthrough mode
 
@@ -124,15 +784,42 @@ class HTML2Kirby(HTMLParser):
         See what category the tag is in, if it's a passthrough one, one to
         be kept or one to be converted. Call the corresponding function.
         """
-        if tag in self.passthrough_tags:
+        self.end_text_run()
+        self.check_excerpt()
+
+        if (self._skip_tag == 'head' and self.is_skipping
+                and tag not in self.head_tags):
+            self.end_head()
+
+        if self.fragment_cache is not None:
+            self.track_fragment_block(tag, True)
+
+        if (self.collect_extras and tag in self.line_break_tags
+                and not self.is_skipping):
+            self.text_line_break()
+
+        if self.is_skipping:
+            if tag == self._skip_tag:
+                self._skip_levels += 1
+
+        elif tag in self.skip_tags and not self.is_passthrough:
+            self._skip_tag = tag
+            self._skip_levels = 1
+
+        elif tag in self.passthrough_tags:
             # This is a passhtrough tag, start the passthrough,
             self.enable_passthrough_mode()
             self.o(self.tag_to_html(tag, attrs))
+            self.open_html(tag)
 
         elif self.is_passthrough:
             # We're in passthrough but this is not the tag that started it
             # Just output the tag
             self.o(self.tag_to_html(tag, attrs))
+            self.open_html(tag)
+
+            if self.collect_extras:
+                self.collect_html_extras(tag, attrs)
 
         elif tag in self.tag_map:
             # Normal tag that we'll rewrite
@@ -143,28 +830,52 @@ class HTML2Kirby(HTMLParser):
         elif tag in self.keep_tags:
             # Tag that we keep as is
             self.keep_start_tag(tag, attrs)
+            self.open_html(tag)
 
         else:
             # Tag that we ignore
-            print("Ignored tag {} with attrs {}".format(
+            self.log.debug("Ignored tag {} with attrs {}".format(
                 tag, ",".join(["{}: {}".format(*a) for a in attrs])
             ))
 
+        if tag in _void_tags:
+            self.count_block(tag)
+            self.check_excerpt()
+
     def handle_endtag(self, tag):
         """Handle the starttag
 
         See what category the tag is in, if it's a passthrough one, one to
         be kept or one to be converted. Call the corresponding function.
         """
-        if self.is_passthrough and tag in self.passthrough_tags:
+        self.end_text_run()
+
+        if (self._skip_tag == 'head' and self.is_skipping
+                and tag in ('body', 'html')):
+            self.end_head()
+
+        if self.fragment_cache is not None:
+            self.track_fragment_block(tag, False)
+
+        if (self.collect_extras and tag in self.line_break_tags
+                and not self.is_skipping):
+            self.text_line_break()
+
+        if self.is_skipping:
+            if tag == self._skip_tag:
+                self._skip_levels -= 1
+
+        elif self.is_passthrough and tag in self.passthrough_tags:
             # We're in passthrough mode and this tag started it, so
             # we disable the passthrough mode
             self.o(self.end_tag_to_html(tag))
+            self.close_html(tag)
             self.disable_passthrough_mode()
 
         elif self.is_passthrough:
             # We're in passthrough mode, write the tag directly
             self.o(self.end_tag_to_html(tag))
+            self.close_html(tag)
 
         elif tag in self.tag_map:
             # Normal tag that is converted
@@ -176,19 +887,97 @@ class HTML2Kirby(HTMLParser):
         elif tag in self.keep_tags:
             # Tags that we keep as is
             self.keep_end_tag(tag)
+            self.close_html(tag)
+
+        self.count_block(tag)
+        self.check_excerpt()
+
+    def end_head(self):
+        """End skipping a head whose end tag was left out"""
+        self._skip_levels = 0
+
+    def track_fragment_block(self, tag, start):
+        """Track the open fragment_tags, see write_cached_fragment()"""
+        lookup_children = self._lookup_children
+        self._lookup_children = False
+
+        if (tag not in self.fragment_tags or self.is_passthrough
+                or self.is_skipping):
+            return
+
+        if start:
+            self._fragment_blocks.append(lookup_children)
+        elif self._fragment_blocks:
+            self._fragment_blocks.pop()
+
+    def open_html(self, tag):
+        """Remember a tag written as html, to close it if needed"""
+        if self.is_excerpt and tag not in _void_tags:
+            self._open_html.append(tag)
+
+    def close_html(self, tag):
+        if tag in self._open_html:
+            index = len(self._open_html) - self._open_html[::-1].index(tag)
+            del self._open_html[index - 1:]
+
+    def count_block(self, tag):
+        """Count the block if the tag ends a top-level block"""
+        if (tag in self.block_tags and self.tag_stack.is_empty()
+                and not self.is_passthrough and not self.is_skipping):
+            self._blocks += 1
 
     def handle_data(self, data):
-        """Handle data
+        """Collect data until the end of the text run
+
+        HTMLParser splits text into several calls when it's fed in chunks.
+        The text is only handled once the run ends with a tag, a comment or
+        the end of the document, so that the result doesn't depend on where
+        the chunks were split.
+        """
+        self._text_run.append(data)
+
+    def handle_comment(self, data):
+        self.end_text_run()
+
+    def handle_decl(self, decl):
+        self.end_text_run()
+
+    def handle_pi(self, data):
+        self.end_text_run()
+
+    def unknown_decl(self, data):
+        self.end_text_run()
+
+    def end_text_run(self):
+        """Handle the data collected for the current text run"""
+        if self._text_run:
+            data = "".join(self._text_run)
+            self._text_run = []
+            self.process_data(data)
+
+    def process_data(self, data):
+        """Handle a text run
 
         If it's just whitespace data, discard it.
         If we're just plain rewriting, append the data to the result.
         If we have some sort of state, append the data to that state.
         """
+        if self.is_skipping:
+            return
+
         if self.is_passthrough:
+            if self.excerpt_chars is not None:
+                data = self.truncate_excerpt(data)
+
             self.o(data)
+
+            if self.collect_extras:
+                self.text(unescape(data))
             return
 
         if len(data.strip()) == 0:
+            if self.collect_extras:
+                self.text(data)
             return
 
         data = data.replace("’", "'")
@@ -196,6 +985,12 @@ class HTML2Kirby(HTMLParser):
 
         data = unescape(data)
 
+        if self.excerpt_chars is not None:
+            data = self.truncate_excerpt(data)
+
+        if self.collect_extras:
+            self.text(data)
+
         # those need to be replaced, as ` means code block in kirby
 
         if self.tag_stack.is_empty():
@@ -218,20 +1013,20 @@ class HTML2Kirby(HTMLParser):
         if not self.tag_stack.is_empty():
             last = self.tag_stack.peek()
 
-            if not last.data.endswith(' '):
-                last.data += ' '
+            if not last.buffer.endswith(' '):
+                last.add_data(' ')
         else:
-            if self.kirbytext == '' or self.kirbytext[-1] == "\n":
+            if not len(self._kirbytext) or self._kirbytext.endswith("\n"):
                 return
 
-            if not self.kirbytext.endswith(' '):
+            if not self._kirbytext.endswith(' '):
                 self.o(' ')
 
     def tag_start_of_line(self):
         """Make sure the tag is at the begininig of a line"""
 
-        if len(self.kirbytext):
-            if self.kirbytext[-1] != "\n":
+        if len(self._kirbytext):
+            if not self._kirbytext.endswith("\n"):
                 self.o("\n")
 
     def p(self):
@@ -241,18 +1036,18 @@ class HTML2Kirby(HTMLParser):
         in the right places, there are two new lines
         """
         if self.tag_stack.is_empty():
-            if not self.kirbytext.endswith("\n\n"):
-                if self.kirbytext.endswith("\n"):
-                    self.kirbytext += "\n"
+            if not self._kirbytext.endswith("\n\n"):
+                if self._kirbytext.endswith("\n"):
+                    self._kirbytext.append("\n")
                 else:
-                    self.kirbytext += "\n\n"
+                    self._kirbytext.append("\n\n")
         else:
             last = self.tag_stack.peek()
-            if not last.data.endswith("\n\n"):
-                if last.data.endswith("\n"):
-                    last.data += "\n"
+            if not last.buffer.endswith("\n\n"):
+                if last.buffer.endswith("\n"):
+                    last.add_data("\n")
                 else:
-                    last.data += "\n\n"
+                    last.add_data("\n\n")
 
     def o(self, data):
         """Append data to the result or state
@@ -261,9 +1056,9 @@ class HTML2Kirby(HTMLParser):
         append it to the current state
         """
         if self.tag_stack.is_empty():
-            if self.kirbytext.endswith(' ') and data.startswith(' '):
+            if self._kirbytext.endswith(' ') and data.startswith(' '):
                 data = data.lstrip()
-            self.kirbytext += data
+            self._kirbytext.append(data)
         else:
             self.tag_stack.add_data(data)
 
@@ -308,9 +1103,15 @@ class HTML2Kirby(HTMLParser):
 
             link = " link: " + href
 
+            if self.collect_extras and 'href' in link_state.attrs:
+                self.links.append(href)
+
         if 'alt' in attrs:
             alt = " alt: " + attrs['alt']
 
+        if self.collect_extras and 'src' in attrs:
+            self.images.append(attrs['src'])
+
         img = "(image: {src}{alt}{link})".format(
             src=attrs.get('src', ''),
             alt=alt,
@@ -411,11 +1212,14 @@ class HTML2Kirby(HTMLParser):
             href=href, title=title, text=text
         )
 
+        if self.collect_extras and 'href' in state.attrs:
+            self.links.append(href)
+
         self.tag_pad()
         self.o(link)
 
     def process_start_list(self, tag, attrs):
-        nest_level = len([s for s in self.tag_stack if s.tag == 'ul'])
+        nest_level = self.tag_stack.count_tag('ul')
 
         attrs.append(('nest_level', nest_level))
         self.tag_stack.push(tag, attrs)
@@ -424,15 +1228,16 @@ class HTML2Kirby(HTMLParser):
         state = self.tag_stack.pop()
 
         nest_level = state.attrs['nest_level']
-        indent = " " * 4 * nest_level
 
         if nest_level == 0:
             self.p()
+            self.o(state.data + "\n")
         else:
+            # a nested list is indented by one level, the lists around it
+            # indent it further when they're closed. All lines are
+            # indented at once instead of line by line.
             self.o("\n")
-
-        for line in state.data.split("\n"):
-            self.o(indent + line + "\n")
+            self.o("    " + state.data.replace("\n", "\n    ") + "\n")
 
     def process_start_li(self, tag, attrs):
         self.tag_stack.push(tag, attrs)
@@ -440,7 +1245,11 @@ class HTML2Kirby(HTMLParser):
     def process_end_li(self, tag):
         state = self.tag_stack.pop()
 
-        sign = '*' if self.tag_stack.peek().tag == 'ul' else '1.'
+        if self.tag_stack.is_empty():
+            # an item without a list, tag soup
+            sign = '*'
+        else:
+            sign = '*' if self.tag_stack.peek().tag == 'ul' else '1.'
 
         self.o(sign + " " + state.data.strip())
         self.o("\n")
@@ -489,3 +1298,24 @@ class HTML2Kirby(HTMLParser):
         self.p()
         self.o("***")
         self.p()
+
+
+def convert(html, profile=None, **options):
+    """Convert a html string to kirbytext
+
+    All the conversion state lives in a parser instance that is created for
+    this call only and never shared, so this function is thread-safe and can
+    be called concurrently from any number of threads (or processes).
+
+    `profile` is the converter class to use. It defaults to HTML2Kirby, pass
+    a subclass to use a customised tag_map, keep_tags or passthrough_tags.
+    Any other keyword arguments are passed to the profile.
+    """
+    if profile is None:
+        profile = HTML2Kirby
+
+    formatter = profile(**options)
+    formatter.feed(html)
+    formatter.close()
+
+    return formatter.kirbytext
@@ -0,0 +1,239 @@
+"""Packed document archives
+
+Converting lots of small files is dominated by opening and stat'ing them.
+A pack stores many documents in a single data file, plus an index file
+with the name, offset and length of every document:
+
+    pages.pack      the utf-8 encoded documents, one after the other
+    pages.pack.idx  MAGIC, the number of documents and for every document
+                    its offset, length, name length and utf-8 encoded name
+
+The data file is read through mmap, so the documents are sliced out of it
+without reading or copying the whole file.
+"""
+import logging
+import mmap
+import os
+import struct
+
+from .html2kirby import convert
+
+__all__ = [
+    "PackReader", "PackWriter", "convert_pack", "pack_directory", "unpack",
+]
+
+log = logging.getLogger(__name__)
+
+MAGIC = b"H2KPACK1"
+
+_header = struct.Struct("<8sQ")
+_entry = struct.Struct("<QQH")
+
+
+def index_path(path):
+    return path + ".idx"
+
+
+class PackWriter:
+    """Write documents to a pack
+
+    The index is written when the writer is closed. If the with block
+    raises, the partially written pack is removed instead.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = []
+
+        self._data = open(path, 'wb')
+        self._offset = 0
+
+    def add(self, name, document):
+        """Add a document (str or bytes) with the given name"""
+        if isinstance(document, str):
+            document = document.encode('utf-8')
+
+        self._data.write(document)
+        self.entries.append((name, self._offset, len(document)))
+        self._offset += len(document)
+
+    def close(self):
+        if self._data.closed:
+            return
+
+        self._data.close()
+
+        with open(index_path(self.path), 'wb') as index:
+            index.write(_header.pack(MAGIC, len(self.entries)))
+
+            for name, offset, length in self.entries:
+                name = name.encode('utf-8')
+                index.write(_entry.pack(offset, length, len(name)))
+                index.write(name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
+
+    def discard(self):
+        """Close the writer and remove the pack, without writing the index"""
+        self._data.close()
+
+        for path in (self.path, index_path(self.path)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class PackReader:
+    """Read the documents of a pack
+
+    Iterating over the reader yields (name, memoryview) tuples, the
+    memoryview being a slice of the memory mapped data file. Use text() to
+    get a document as str.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.entries = self._read_index()
+        self.names = {name: i for i, (name, _, _) in enumerate(self.entries)}
+
+        self._file = open(path, 'rb')
+
+        if os.fstat(self._file.fileno()).st_size:
+            self._mmap = mmap.mmap(self._file.fileno(), 0,
+                                   access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        else:
+            # empty files can't be memory mapped
+            self._mmap = None
+            self._view = memoryview(b"")
+
+    def _read_index(self):
+        with open(index_path(self.path), 'rb') as index:
+            data = index.read()
+
+        magic, count = _header.unpack_from(data)
+        if magic != MAGIC:
+            raise ValueError("{} is not a pack index".format(
+                index_path(self.path)))
+
+        entries = []
+        position = _header.size
+
+        for _ in range(count):
+            offset, length, name_length = _entry.unpack_from(data, position)
+            position += _entry.size
+
+            name = data[position:position + name_length].decode('utf-8')
+            position += name_length
+
+            entries.append((name, offset, length))
+
+        return entries
+
+    def __len__(self):
+        return len(self.entries)
+
+    def __getitem__(self, i):
+        name, offset, length = self.entries[i]
+
+        return name, self._view[offset:offset + length]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def text(self, i):
+        """The document at index i (or with name i) as str"""
+        if isinstance(i, str):
+            i = self.names[i]
+
+        return str(self[i][1], 'utf-8')
+
+    def close(self):
+        self._view.release()
+
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                # documents are still referenced, the mapping is closed
+                # once they're garbage collected
+                pass
+
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def pack_directory(directory, path, extensions=('.html', '.htm')):
+    """Pack all files with the given extensions below directory
+
+    The documents are named by their path relative to directory, with /
+    as separator. Returns the number of packed documents.
+    """
+    with PackWriter(path) as writer:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+
+            for filename in sorted(files):
+                if not filename.lower().endswith(extensions):
+                    continue
+
+                filepath = os.path.join(root, filename)
+                name = os.path.relpath(filepath, directory)
+
+                with open(filepath, 'rb') as f:
+                    writer.add(name.replace(os.sep, '/'), f.read())
+
+        return len(writer.entries)
+
+
+def unpack(path, directory):
+    """Write every document of the pack to a file in directory
+
+    Returns the number of written documents.
+    """
+    with PackReader(path) as reader:
+        for name, document in reader:
+            parts = name.split('/')
+            if '..' in parts or os.path.isabs(name):
+                raise ValueError("Invalid document name {}".format(name))
+
+            filepath = os.path.join(directory, *parts)
+            os.makedirs(os.path.dirname(filepath), exist_ok=True)
+
+            with open(filepath, 'wb') as f:
+                f.write(document)
+
+        return len(reader)
+
+
+def convert_pack(source, destination, suffix='.txt', **options):
+    """Convert every document of the source pack into the destination pack
+
+    The extension of the document names is replaced with suffix. The
+    keyword arguments are passed to convert(). Documents that can't be
+    converted are logged and left out. Returns the number of converted
+    documents.
+    """
+    with PackReader(source) as reader, PackWriter(destination) as writer:
+        for i, (name, _) in enumerate(reader):
+            try:
+                kirbytext = convert(reader.text(i), **options)
+            except Exception:
+                log.exception("Can't convert %s", name)
+                continue
+
+            writer.add(os.path.splitext(name)[0] + suffix, kirbytext)
+
+        return len(writer.entries)
@@ -0,0 +1,343 @@
+"""Record and replay the feed() and close() calls of a parser
+
+How fast a document converts depends on how it arrives: the number and
+size of the chunks it's fed in. Wrap the parser in a Recorder to record
+the calls to a file:
+
+    formatter = Recorder(HTML2Kirby(), "session.jsonl", anonymize=True)
+    for chunk in response:
+        formatter.feed(chunk)
+    formatter.close()
+
+and replay them under timing instrumentation:
+
+    python -m html2kirby replay session.jsonl --repeat 5
+
+With anonymize, letters and digits of the text, comments, attribute
+values and the content of <script> and <style> are masked. Tag and
+attribute names, the chunk boundaries and all lengths are kept, so the
+recording can be shared without the content.
+
+The recording is replayed with the profile it was recorded with, unless
+another one is passed to replay().
+
+The file has one JSON object per line, a header followed by the calls:
+
+    {"version": 1, "profile": "html2kirby.html2kirby.HTML2Kirby", ...}
+    {"call": "feed", "data": "<p>Some te"}
+    {"call": "close"}
+"""
+import importlib
+import json
+import logging
+import time
+
+from .html2kirby import HTML2Kirby
+
+__all__ = ["Anonymizer", "Recorder", "ReplayReport", "load", "replay"]
+
+log = logging.getLogger(__name__)
+
+VERSION = 1
+
+
+class Anonymizer:
+    """Mask the content of html while keeping its structure and lengths
+
+    The html can be passed in chunks, tags split between chunks are
+    handled.
+    """
+    TEXT, LT, TAG, QUOTED, UNQUOTED, COMMENT, RAW = range(7)
+
+    raw_tags = HTML2Kirby.CDATA_CONTENT_ELEMENTS
+    """Tags whose content isn't html, it's masked up to their end tag"""
+
+    def __init__(self):
+        self.state = self.TEXT
+        self.quote = None
+        self.recent = ''
+        """The last few characters, to detect <!-- and -->"""
+
+        self.tag_name = ''
+        """Name of the current tag"""
+
+        self.reading_name = False
+
+        self.raw_end = ''
+        """The end tag that ends the RAW state"""
+
+        self.raw_matched = 0
+        """Number of characters of raw_end matched so far"""
+
+    @staticmethod
+    def mask(char):
+        if char.isdigit():
+            return '0'
+        if char.isalpha():
+            return 'x'
+        return char
+
+    def end_tag(self):
+        """The > of a tag, the content of raw_tags is masked as a whole"""
+        if self.tag_name in self.raw_tags:
+            self.state = self.RAW
+            self.raw_end = '</' + self.tag_name
+            self.raw_matched = 0
+        else:
+            self.state = self.TEXT
+
+    def feed(self, data):
+        result = []
+
+        for char in data:
+            self.recent = (self.recent + char)[-4:]
+            state = self.state
+
+            if state == self.LT:
+                # only a < followed by one of these starts a tag
+                if char.isalpha() or char in '/!?':
+                    self.state = state = self.TAG
+                    self.tag_name = ''
+                    self.reading_name = True
+                else:
+                    self.state = state = self.TEXT
+
+            if state == self.TEXT:
+                if char == '<':
+                    self.state = self.LT
+                    result.append(char)
+                else:
+                    result.append(self.mask(char))
+
+            elif state == self.TAG:
+                result.append(char)
+
+                if self.reading_name:
+                    if char.isspace() or char in '/>':
+                        self.reading_name = False
+                    else:
+                        self.tag_name += char.lower()
+
+                if char == '>':
+                    self.end_tag()
+                elif self.recent == '<!--':
+                    self.state = self.COMMENT
+                elif char in '"\'':
+                    self.state = self.QUOTED
+                    self.quote = char
+                elif char == '=':
+                    self.state = self.UNQUOTED
+
+            elif state == self.QUOTED:
+                if char == self.quote:
+                    self.state = self.TAG
+                    result.append(char)
+                else:
+                    result.append(self.mask(char))
+
+            elif state == self.UNQUOTED:
+                if char in '"\'':
+                    self.state = self.QUOTED
+                    self.quote = char
+                    result.append(char)
+                elif char == '>':
+                    self.end_tag()
+                    result.append(char)
+                elif char.isspace():
+                    self.state = self.TAG
+                    result.append(char)
+                else:
+                    result.append(self.mask(char))
+
+            elif state == self.COMMENT:
+                result.append(self.mask(char))
+
+                if self.recent.endswith('-->'):
+                    self.state = self.TEXT
+
+            elif state == self.RAW:
+                # only the end tag is kept, everything up to it is masked
+                if char.lower() == self.raw_end[self.raw_matched]:
+                    result.append(char)
+                    self.raw_matched += 1
+
+                    if self.raw_matched == len(self.raw_end):
+                        self.state = self.TAG
+                        self.tag_name = ''
+                else:
+                    result.append(self.mask(char))
+                    self.raw_matched = 1 if char == '<' else 0
+
+        return ''.join(result)
+
+
+class Recorder:
+    """Wrap a parser and record its feed() and close() calls to a file
+
+    Everything else is passed through to the parser. target is a path or a
+    text file.
+    """
+    def __init__(self, formatter, target, anonymize=False):
+        self.formatter = formatter
+        self.anonymizer = Anonymizer() if anonymize else None
+
+        if isinstance(target, str):
+            self.file = open(target, 'w', encoding='utf-8')
+            self._owns_file = True
+        else:
+            self.file = target
+            self._owns_file = False
+
+        profile = type(formatter)
+        self._write({
+            'version': VERSION,
+            'profile': "{}.{}".format(profile.__module__,
+                                      profile.__qualname__),
+            'anonymized': anonymize,
+        })
+
+    def _write(self, record):
+        self.file.write(json.dumps(record) + "\n")
+
+    def feed(self, data):
+        recorded = data
+        if self.anonymizer is not None:
+            recorded = self.anonymizer.feed(data)
+
+        self._write({'call': 'feed', 'data': recorded})
+        self.formatter.feed(data)
+
+    def close(self):
+        self._write({'call': 'close'})
+        self.formatter.close()
+
+        if self._owns_file:
+            self.file.close()
+        else:
+            self.file.flush()
+
+    def __getattr__(self, name):
+        return getattr(self.formatter, name)
+
+
+def load(path):
+    """Load a recording, returns the header and the list of calls"""
+    with open(path, 'r', encoding='utf-8') as f:
+        header = json.loads(f.readline())
+
+        if header.get('version') != VERSION:
+            raise ValueError("Unsupported recording version {}".format(
+                header.get('version')))
+
+        calls = [json.loads(line) for line in f if line.strip()]
+
+    return header, calls
+
+
+class ReplayReport:
+    """Timings of a replayed recording
+
+    timings has the (call, size, seconds) of every call of the fastest
+    repetition.
+    """
+    def __init__(self, timings, repeat, kirbytext):
+        self.timings = timings
+        self.repeat = repeat
+        self.kirbytext = kirbytext
+
+    @property
+    def total(self):
+        return sum(seconds for _, _, seconds in self.timings)
+
+    def as_dict(self):
+        feeds = [t for t in self.timings if t[0] == 'feed']
+        size = sum(s for _, s, _ in feeds)
+        slowest = max(range(len(self.timings)),
+                      key=lambda i: self.timings[i][2], default=None)
+
+        return {
+            'repeat': self.repeat,
+            'calls': len(self.timings),
+            'feed_calls': len(feeds),
+            'size': size,
+            'mean_chunk_size': size / len(feeds) if feeds else 0,
+            'total_seconds': self.total,
+            'chars_per_second': size / self.total if self.total else 0,
+            'slowest_call': slowest,
+            'slowest_call_seconds': (self.timings[slowest][2]
+                                     if slowest is not None else 0),
+            'output_size': len(self.kirbytext),
+        }
+
+    def __str__(self):
+        return "\n".join("{:<22} {}".format(key, value)
+                         for key, value in self.as_dict().items())
+
+
+def load_profile(name):
+    """Import the profile recorded as "module.qualname"
+
+    Raises TypeError if the name isn't an HTML2Kirby subclass.
+    """
+    module, _, qualname = name.rpartition('.')
+
+    while module:
+        try:
+            profile = importlib.import_module(module)
+            break
+        except ImportError:
+            # nested class, e.g. module.Outer.Inner
+            module, _, outer = module.rpartition('.')
+            qualname = outer + '.' + qualname
+    else:
+        raise ImportError("Can't import the profile {}".format(name))
+
+    for attribute in qualname.split('.'):
+        profile = getattr(profile, attribute)
+
+    if not (isinstance(profile, type) and issubclass(profile, HTML2Kirby)):
+        raise TypeError("{} is not a profile".format(name))
+
+    return profile
+
+
+def replay(path, profile=None, repeat=1, **options):
+    """Replay a recording and time every call
+
+    The calls are replayed repeat times, each time on a new instance of
+    profile created with the given options. The profile defaults to the
+    one that was recorded, or HTML2Kirby if it can't be imported. The
+    report of the fastest repetition is returned.
+    """
+    header, calls = load(path)
+
+    if profile is None:
+        try:
+            profile = load_profile(header['profile'])
+        except (ImportError, AttributeError, KeyError, TypeError):
+            log.warning("Can't load the recorded profile %s, replaying "
+                        "with HTML2Kirby", header.get('profile'))
+            profile = HTML2Kirby
+    best = None
+
+    for _ in range(repeat):
+        formatter = profile(**options)
+        timings = []
+
+        for call in calls:
+            if call['call'] == 'feed':
+                data = call['data']
+                start = time.perf_counter()
+                formatter.feed(data)
+                timings.append(('feed', len(data),
+                                time.perf_counter() - start))
+            else:
+                start = time.perf_counter()
+                formatter.close()
+                timings.append(('close', 0, time.perf_counter() - start))
+
+        report = ReplayReport(timings, repeat, formatter.kirbytext)
+        if best is None or report.total < best.total:
+            best = report
+
+    return best
@@ -0,0 +1,320 @@
+"""Local conversion server
+
+Spawning a python process for every conversion costs far more than the
+conversion itself. The server keeps a pool of warm worker processes and
+converts html sent to it over localhost HTTP or a Unix socket:
+
+    python -m html2kirby serve --port 8009
+    curl --data-binary @page.html http://127.0.0.1:8009/convert
+
+Endpoints:
+
+    POST /convert  html in the body, responds with the kirbytext
+    POST /batch    a JSON list of html documents in the body, responds with
+                   a JSON list of kirbytexts
+    GET  /stats    throughput and latency statistics as JSON
+
+Connections are kept alive (HTTP/1.1) until they're idle for idle_timeout
+seconds. Conversions that take longer than timeout seconds are answered
+with 504. The workers are then terminated and replaced, so a pathological
+document doesn't keep a worker busy. Requests that were converted by the
+terminated workers at the time are retried once in the new pool.
+"""
+import json
+import logging
+import os
+import socketserver
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError, wait
+from concurrent.futures.process import BrokenProcessPool
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+from .html2kirby import convert
+
+__all__ = ["ConversionServer", "UnixConversionServer", "make_server"]
+
+log = logging.getLogger(__name__)
+
+
+def _warm_up():
+    """Warm up a worker process, so the first request isn't slower"""
+    convert("<p>Warm <b>up</b></p>")
+
+
+def _convert_documents(documents):
+    return [convert(html) for html in documents]
+
+
+class ServerStats:
+    """Throughput and latency of the server
+
+    The latency percentiles are computed over the last window requests.
+    """
+    def __init__(self, window=1024):
+        self.started = time.monotonic()
+        self.requests = 0
+        self.documents = 0
+        self.errors = 0
+        self.timeouts = 0
+
+        self._latencies = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, documents=0, error=False, timeout=False):
+        with self._lock:
+            self.requests += 1
+            self.documents += documents
+            self.errors += error
+            self.timeouts += timeout
+            self._latencies.append(latency)
+
+    def as_dict(self):
+        with self._lock:
+            latencies = sorted(self._latencies)
+            uptime = time.monotonic() - self.started
+
+            def percentile(p):
+                if not latencies:
+                    return 0.0
+                index = min(len(latencies) - 1, int(len(latencies) * p))
+                return latencies[index] * 1000
+
+            return {
+                'uptime': uptime,
+                'requests': self.requests,
+                'documents': self.documents,
+                'errors': self.errors,
+                'timeouts': self.timeouts,
+                'documents_per_second': self.documents / uptime,
+                'latency_ms': {
+                    'mean': (sum(latencies) / len(latencies) * 1000
+                             if latencies else 0.0),
+                    'p50': percentile(0.5),
+                    'p90': percentile(0.9),
+                    'p99': percentile(0.99),
+                    'max': latencies[-1] * 1000 if latencies else 0.0,
+                },
+            }
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server_version = "html2kirby"
+
+    def setup(self):
+        self.timeout = self.server.idle_timeout
+        super().setup()
+
+    def do_GET(self):
+        if self.path == '/stats':
+            self.respond(200, json.dumps(self.server.stats.as_dict()),
+                         'application/json')
+        else:
+            self.send_error(404)
+
+    def do_POST(self):
+        if self.path not in ('/convert', '/batch'):
+            self.send_error(404)
+            return
+
+        if 'Content-Length' not in self.headers:
+            self.send_error(411)
+            return
+
+        start = time.monotonic()
+
+        try:
+            length = int(self.headers['Content-Length'])
+            if length < 0:
+                raise ValueError
+        except ValueError:
+            self.server.stats.record(time.monotonic() - start, error=True)
+            self.send_error(400, "Invalid Content-Length")
+            return
+
+        body = self.rfile.read(length)
+
+        try:
+            if self.path == '/batch':
+                documents = json.loads(body.decode('utf-8'))
+            else:
+                documents = [body.decode('utf-8')]
+
+            if (not isinstance(documents, list)
+                    or not all(isinstance(d, str) for d in documents)):
+                raise ValueError("Expected a JSON list of html documents")
+        except ValueError as e:
+            self.server.stats.record(time.monotonic() - start, error=True)
+            self.send_error(400, str(e))
+            return
+
+        try:
+            results = self.server.convert(documents)
+        except TimeoutError:
+            self.server.stats.record(time.monotonic() - start, timeout=True)
+            self.send_error(504)
+            return
+        except Exception as e:
+            log.exception("Conversion failed")
+            self.server.stats.record(time.monotonic() - start, error=True)
+            self.send_error(500, str(e))
+            return
+
+        if self.path == '/batch':
+            self.respond(200, json.dumps(results), 'application/json')
+        else:
+            self.respond(200, results[0], 'text/plain; charset=utf-8')
+
+        self.server.stats.record(time.monotonic() - start,
+                                 documents=len(documents))
+
+    def respond(self, status, body, content_type):
+        body = body.encode('utf-8')
+
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix sockets don't have a client address
+        return self.client_address[0] if self.client_address else 'unix'
+
+    def log_message(self, format, *args):
+        log.debug("%s %s", self.address_string(), format % args)
+
+
+class ConversionServerMixin:
+    """Convert the documents of the requests in a pool of processes"""
+    daemon_threads = True
+
+    def setup_pool(self, workers=None, timeout=30, idle_timeout=60,
+                   batch_size=16):
+        self.workers = workers or os.cpu_count() or 1
+        self.request_timeout = timeout
+        self.idle_timeout = idle_timeout
+        self.batch_size = batch_size
+        self.stats = ServerStats()
+
+        self._pool_lock = threading.Lock()
+        self.pool = self.start_pool()
+
+    def start_pool(self):
+        pool = ProcessPoolExecutor(self.workers)
+
+        # start and warm up the workers right away, instead of on the first
+        # request (ProcessPoolExecutor has no initializer before Python 3.7)
+        wait([pool.submit(_warm_up) for _ in range(self.workers)])
+
+        return pool
+
+    def restart_pool(self, pool):
+        """Terminate the workers of pool and replace it with a new one
+
+        Futures can't be cancelled once they're running, terminating the
+        workers is the only way to stop a conversion. Does nothing if pool
+        was already replaced.
+        """
+        with self._pool_lock:
+            if pool is not self.pool:
+                return
+
+            log.warning("Restarting the worker pool")
+
+            # ProcessPoolExecutor has no public way to terminate its workers
+            for process in list(getattr(pool, '_processes', {}).values()):
+                process.terminate()
+
+            pool.shutdown(wait=False)
+            self.pool = self.start_pool()
+
+    def convert(self, documents, deadline=None, retry=True):
+        """Convert the documents, split in batches over the workers
+
+        Raises TimeoutError if they aren't converted within
+        self.request_timeout seconds. The workers are restarted then, if
+        they already started converting them.
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.request_timeout
+
+        pool = self.pool
+        futures = []
+
+        try:
+            for i in range(0, len(documents), self.batch_size):
+                futures.append(pool.submit(
+                    _convert_documents, documents[i:i + self.batch_size]))
+        except RuntimeError:
+            # the pool was shut down, since it's being replaced
+            self.restart_pool(pool)
+            for future in futures:
+                future.cancel()
+
+            return self.convert(documents, deadline, retry)
+
+        try:
+            return [
+                kirbytext for future in futures
+                for kirbytext in future.result(
+                    max(0, deadline - time.monotonic()))
+            ]
+        except TimeoutError:
+            # only terminate the workers if they're busy with this request,
+            # not if it timed out waiting in the queue behind others
+            if any(future.running() for future in futures):
+                self.restart_pool(pool)
+            raise
+        except BrokenProcessPool:
+            # the workers were terminated for another request that timed
+            # out, or one crashed
+            self.restart_pool(pool)
+
+            if not retry:
+                raise
+
+            return self.convert(documents, deadline, retry=False)
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown()
+
+
+class ConversionServer(ConversionServerMixin, socketserver.ThreadingMixIn,
+                       HTTPServer):
+    pass
+
+
+if hasattr(socketserver, 'UnixStreamServer'):
+    class UnixConversionServer(ConversionServerMixin,
+                               socketserver.ThreadingMixIn,
+                               socketserver.UnixStreamServer):
+        def server_close(self):
+            super().server_close()
+
+            try:
+                os.unlink(self.server_address)
+            except OSError:
+                pass
+
+
+def make_server(host='127.0.0.1', port=8009, socket_path=None, **kwargs):
+    """Create a conversion server
+
+    It listens on socket_path if given, else on host:port. The other
+    keyword arguments are passed to ConversionServerMixin.setup_pool.
+    """
+    if socket_path is not None:
+        server = UnixConversionServer(socket_path, ConversionHandler)
+    else:
+        server = ConversionServer((host, port), ConversionHandler)
+
+    server.setup_pool(**kwargs)
+
+    return server
@@ -0,0 +1,228 @@
+"""Watch a directory and convert html files when they change
+
+    python -m html2kirby watch pages/ out/
+
+The source directory is polled for changes. Once a burst of changes has
+settled for debounce seconds, the changed files are converted in a small
+pool of worker processes and written to the destination directory, with
+the same relative path and a .txt extension.
+
+The hash of every converted file is kept, so saving a file without
+changing it doesn't convert it again. On start up, files whose output is
+newer than the file itself aren't converted either. Files that can't be
+converted are logged and converted again once they change.
+"""
+import hashlib
+import logging
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .html2kirby import convert
+
+__all__ = ["Watcher"]
+
+log = logging.getLogger(__name__)
+
+
+class Watcher:
+    def __init__(self, source, destination, interval=0.5, debounce=0.3,
+                 workers=2, extensions=('.html', '.htm'), suffix='.txt'):
+        self.source = source
+        self.destination = destination
+        self.interval = interval
+        self.debounce = debounce
+        self.workers = workers
+        self.extensions = extensions
+        self.suffix = suffix
+
+        self.stats = {}
+        """(mtime, size) of every file at the last scan"""
+
+        self.hashes = {}
+        """Hash of the content of every converted file"""
+
+        self._pool = None
+
+    @property
+    def pool(self):
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers)
+
+        return self._pool
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def output_path(self, path):
+        relative = os.path.relpath(path, self.source)
+
+        return os.path.join(self.destination,
+                            os.path.splitext(relative)[0] + self.suffix)
+
+    def scan(self):
+        """Stat all files to watch, returns {path: (mtime, size)}"""
+        stats = {}
+
+        for root, _, files in os.walk(self.source):
+            for filename in files:
+                if not filename.lower().endswith(self.extensions):
+                    continue
+
+                path = os.path.join(root, filename)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    # deleted while scanning
+                    continue
+
+                stats[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return stats
+
+    def poll(self):
+        """Scan the files, returns the changed and the deleted ones"""
+        stats = self.scan()
+
+        changed = {path for path, stat in stats.items()
+                   if self.stats.get(path) != stat}
+        deleted = set(self.stats) - set(stats)
+
+        self.stats = stats
+
+        return changed, deleted
+
+    def wait_for_changes(self):
+        """Poll until there are changes and they settled for self.debounce
+
+        Returns the changed and the deleted files.
+        """
+        changed, deleted = self.poll()
+
+        while not changed and not deleted:
+            time.sleep(self.interval)
+            changed, deleted = self.poll()
+
+        while True:
+            time.sleep(self.debounce)
+            more_changed, more_deleted = self.poll()
+
+            if not more_changed and not more_deleted:
+                break
+
+            changed = (changed | more_changed) - more_deleted
+            deleted = (deleted | more_deleted) - more_changed
+
+        return changed, deleted
+
+    def start(self):
+        """Take the initial scan
+
+        Files that have an output newer than themselves are hashed and
+        considered converted. Returns the files that need to be converted.
+        """
+        self.stats = self.scan()
+        outdated = set()
+
+        for path, (mtime, _) in self.stats.items():
+            try:
+                output_mtime = os.stat(self.output_path(path)).st_mtime_ns
+            except OSError:
+                output_mtime = None
+
+            if output_mtime is not None and output_mtime >= mtime:
+                try:
+                    with open(path, 'rb') as f:
+                        self.hashes[path] = hashlib.sha1(f.read()).digest()
+                except OSError:
+                    # deleted since the scan, the next poll notices
+                    continue
+            else:
+                outdated.add(path)
+
+        return outdated
+
+    def update(self, changed, deleted=()):
+        """Convert the changed files and remove the outputs of deleted ones
+
+        Changed files whose content didn't change are skipped. Files that
+        fail to convert are logged and skipped, their hash is only kept once
+        their output is written. Returns the list of converted files.
+        """
+        documents = {}
+        digests = {}
+
+        for path in sorted(changed):
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            except OSError:
+                continue
+
+            digest = hashlib.sha1(content).digest()
+            if self.hashes.get(path) == digest:
+                log.debug("%s is unchanged", path)
+                continue
+
+            try:
+                documents[path] = content.decode('utf-8')
+            except UnicodeDecodeError as e:
+                log.error("Can't convert %s: %s", path, e)
+                continue
+
+            digests[path] = digest
+
+        futures = [(path, self.pool.submit(convert, html))
+                   for path, html in documents.items()]
+        converted = []
+
+        for path, future in futures:
+            try:
+                kirbytext = future.result()
+            except BrokenProcessPool:
+                # a worker died, start a new pool for the next update
+                log.error("Can't convert %s: the worker died", path)
+                self.close()
+                continue
+            except Exception:
+                log.exception("Can't convert %s", path)
+                continue
+
+            output = self.output_path(path)
+
+            try:
+                os.makedirs(os.path.dirname(output), exist_ok=True)
+
+                with open(output, 'w', encoding='utf-8') as f:
+                    f.write(kirbytext)
+            except OSError as e:
+                log.error("Can't write %s: %s", output, e)
+                continue
+
+            self.hashes[path] = digests[path]
+            converted.append(path)
+            log.info("Converted %s", path)
+
+        for path in deleted:
+            self.hashes.pop(path, None)
+
+            try:
+                os.remove(self.output_path(path))
+                log.info("Removed the output of %s", path)
+            except OSError:
+                pass
+
+        return converted
+
+    def run(self):
+        """Convert outdated files and then watch for changes forever"""
+        try:
+            self.update(self.start())
+
+            while True:
+                self.update(*self.wait_for_changes())
+        finally:
+            self.close()
@@ -0,0 +1,118 @@
+"""Make sure the conversion scales linearly with the size of the input
+
+Every stress shape is converted at the sizes n, 2n, 4n and 8n. The growth
+exponent of the time and the peak memory is fitted over these sizes: it's 1
+for linear behaviour and 2 for quadratic behaviour. It may be at most 1 plus
+the tolerance.
+"""
+import gc
+import math
+import time
+import tracemalloc
+
+import pytest
+
+from html2kirby import convert
+
+SIZES = (1, 2, 4, 8)
+
+TIME_TOLERANCE = 0.35
+MEMORY_TOLERANCE = 0.15
+
+# The quadratic cost of copying the output over and over only shows with
+# enough output per element, so every element carries a good bit of text
+TEXT = "Lorem ipsum dolor sit amet " * 4
+
+shapes = {
+    'paragraphs': lambda n: "<p>{}</p>".format(TEXT) * n,
+    'list_items': lambda n: (
+        "<ul>" + "<li>{} <b>bold</b></li>".format(TEXT) * n + "</ul>"),
+    'nested_lists': lambda n: (
+        "<ul><li>{}<ul><li>b</li></ul></li></ul>".format(TEXT) * n),
+    'li_lines': lambda n: (
+        "<ul><li>" + "{}<br>".format(TEXT) * n + "</li></ul>"),
+    'strong_lines': lambda n: "<b>" + "{}<br>".format(TEXT) * n + "</b>",
+    'quote_lines': lambda n: (
+        "<blockquote>" + "{}<br>".format(TEXT) * n + "</blockquote>"),
+    'links': lambda n: (
+        "<p>" + '<a href="#">{}</a> and '.format(TEXT) * n + "</p>"),
+    'inline': lambda n: "{} <i>emph</i> ".format(TEXT) * n,
+    'passthrough': lambda n: (
+        "<table>" + "<tr><td>{}</td></tr>".format(TEXT) * n + "</table>"),
+    'deep_divs': lambda n: "<div>" * n + TEXT + "</div>" * n,
+    'deep_ordered_lists': lambda n: "<ol><li>x" * n + "</li></ol>" * n,
+    'deep_unordered_lists': lambda n: "<ul><li>x" * n + "</li></ul>" * n,
+    'deep_quotes': lambda n: "<blockquote>x" * n + "</blockquote>" * n,
+    'deep_emphasis': lambda n: "<b>x <i>y " * n + "</i></b>" * n,
+    'scripts': lambda n: (
+        "<p>{}</p><script>var a = 1;</script>".format(TEXT) * n),
+}
+
+
+# Every level of an unordered list is indented by four more spaces, so the
+# output itself grows quadratically with the depth. Every state copies the
+# text of the states in it, which makes it worse than that.
+quadratic_output = pytest.mark.xfail(
+    run=False, reason="the output grows quadratically with the depth")
+
+
+def params(shapes):
+    return [
+        pytest.param(shape, marks=quadratic_output)
+        if shape == 'deep_unordered_lists' else shape
+        for shape in sorted(shapes)
+    ]
+
+
+def growth_exponent(values):
+    """Fit values = c * SIZES ** exponent and return the exponent"""
+    xs = [math.log(size) for size in SIZES]
+    ys = [math.log(value) for value in values]
+
+    x_mean = sum(xs) / len(xs)
+    y_mean = sum(ys) / len(ys)
+
+    return (sum((x - x_mean) * (y - y_mean) for x, y in zip(xs, ys))
+            / sum((x - x_mean) ** 2 for x in xs))
+
+
+def measure_time(html, repeat=3):
+    gc.collect()
+    gc.disable()
+
+    try:
+        timings = []
+
+        for _ in range(repeat):
+            start = time.perf_counter()
+            convert(html)
+            timings.append(time.perf_counter() - start)
+
+        return min(timings)
+    finally:
+        gc.enable()
+
+
+def measure_memory(html):
+    tracemalloc.start()
+
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        convert(html)
+        return tracemalloc.get_traced_memory()[1] - baseline
+    finally:
+        tracemalloc.stop()
+
+
+@pytest.mark.parametrize("shape", params(shapes))
+def test_linear_time(shape):
+    timings = [measure_time(shapes[shape](500 * size)) for size in SIZES]
+
+    assert growth_exponent(timings) <= 1 + TIME_TOLERANCE, timings
+
+
+@pytest.mark.parametrize("shape", params(shapes))
+def test_linear_memory(shape):
+    peaks = [measure_memory(shapes[shape](250 * size)) for size in SIZES]
+
+    assert growth_exponent(peaks) <= 1 + MEMORY_TOLERANCE, peaks
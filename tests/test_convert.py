@@ -0,0 +1,50 @@
+import glob
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from html2kirby import HTML2Kirby, convert
+
+path = os.path.dirname(os.path.abspath(__file__))
+fixtures = sorted(glob.glob(os.path.join(path, "extended_tests/*.html")))
+
+
+def read(filename):
+    with open(filename, 'r') as f:
+        return f.read()
+
+
+def test_convert():
+    assert convert('<img src="foo.jpg" alt="foobar" />') == (
+        "(image: foo.jpg alt: foobar)")
+
+
+def test_convert_profile():
+    class NoTables(HTML2Kirby):
+        passthrough_tags = ('svg',)
+
+    html = "<table><tr><td><strong>fette sache</strong></td></tr></table>"
+
+    assert convert(html) == html
+    assert convert(html, profile=NoTables).strip() == "**fette sache**"
+
+
+def test_passthrough_state_not_shared():
+    first = HTML2Kirby()
+    first.feed("<table><tr><td>")
+
+    second = HTML2Kirby()
+    second.feed("<b>bold</b>")
+
+    assert first.is_passthrough
+    assert not second.is_passthrough
+    assert second.kirbytext == "**bold** "
+
+
+def test_convert_threads():
+    documents = [read(f) for f in fixtures] * 20
+    expected = [convert(html) for html in documents]
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(convert, documents))
+
+    assert results == expected
@@ -0,0 +1,138 @@
+import pytest
+
+from html2kirby import HTML2Kirby, convert
+from html2kirby.cli import main
+
+
+def test_excerpt_blocks():
+    html = "<h1>Title</h1><p>First</p><p>Second</p><p>Third</p>"
+
+    assert convert(html, excerpt_blocks=2) == "# Title\n\nFirst\n\n"
+
+
+def test_excerpt_blocks_nested():
+    # only top-level blocks are counted
+    html = "<ul><li><p>a</p></li><li><p>b</p></li></ul><p>after</p><p>x</p>"
+
+    assert "after" in convert(html, excerpt_blocks=2)
+    assert "x" not in convert(html, excerpt_blocks=2)
+
+
+def test_excerpt_hr():
+    assert convert("<p>a</p><hr /><p>b</p>", excerpt_blocks=2) == (
+        "\n\na\n\n***\n\n")
+
+
+def test_excerpt_chars():
+    html = "<p>{}</p><p>more</p>".format("word " * 100)
+    kirbytext = convert(html, excerpt_chars=50)
+
+    assert kirbytext == "\n\n{}\n\n".format(" ".join(["word"] * 9))
+    assert len(kirbytext) <= 50 + len("\n\n")
+
+
+def test_excerpt_chars_long_word():
+    # without whitespace within the limit, the text is cut at the limit
+    assert convert("<p>a</p><p>{}</p>".format("x" * 100),
+                   excerpt_chars=20) == "\n\na\n\n{}\n\n".format("x" * 15)
+
+
+def test_excerpt_chars_whitespace():
+    assert convert("<p>one\ttwo\nthree four</p>", excerpt_chars=15) == (
+        "\n\none\ttwo\nthree\n\n")
+
+
+def test_excerpt_chars_without_spaces():
+    html = "<p>{}</p>".format("日本語の文章です。" * 30)
+
+    assert convert(html, excerpt_chars=40) == "\n\n{}\n\n".format(
+        ("日本語の文章です。" * 5)[:38])
+
+
+def test_excerpt_chars_pre():
+    kirbytext = convert("<pre>{}</pre>".format("x" * 100), excerpt_chars=40)
+
+    assert kirbytext == "\n\n```\n{}\n```\n\n".format("x" * 40)
+
+
+def test_excerpt_chars_passthrough():
+    html = "<table><tr><td>{}</td></tr></table>".format("y" * 80)
+    kirbytext = convert(html, excerpt_chars=20)
+
+    assert kirbytext == "<table><tr><td>yyyyy</td></tr></table>"
+
+
+def test_excerpt_short_document():
+    html = "<p>Just <em>this</em></p>"
+
+    assert convert(html, excerpt_chars=1000) == convert(html)
+    assert convert(html, excerpt_blocks=5) == convert(html)
+
+
+@pytest.mark.parametrize("html,excerpt", [
+    ("<ul><li>one</li><li>two <b>bold <a href='x'>link {}",
+     "\n\n* one\n* two **bold (link: x text: link filler)**\n\n"),
+    ("<blockquote>quote <em>emphasis {}",
+     "> quote _emphasis filler filler_\n\n"),
+    ("<ol><li>first<ul><li>nested {}",
+     "\n\n1. first\n\n* nested filler filler\n\n"),
+])
+def test_excerpt_closes_frames(html, excerpt):
+    assert convert(html.format("filler " * 50), excerpt_chars=30) == excerpt
+
+
+def test_excerpt_closes_html():
+    html = "<table><tr><td>cell</td><td><strong>{}".format("y " * 50)
+    kirbytext = convert(html, excerpt_chars=40)
+
+    assert kirbytext.startswith("<table><tr><td>cell</td><td><strong>")
+    assert kirbytext.endswith("</strong></td></tr></table>")
+
+
+def test_excerpt_closes_keep_tags():
+    assert convert("<p>a <u>{}".format("x " * 40), excerpt_chars=20) == (
+        "\n\na <u>x x x x x x x</u>")
+
+
+def test_excerpt_closes_orphan_item():
+    """Closing frames doesn't fail on tag soup"""
+    assert convert("<li>one two three four five six seven",
+                   excerpt_chars=10) == "* one two\n"
+
+
+def test_excerpt_stops_feeding():
+    formatter = HTML2Kirby(excerpt_blocks=1)
+    formatter.feed("<p>he")
+    formatter.feed("llo</p><p>wo")
+
+    assert formatter.excerpt_complete
+    assert formatter.rawdata == ''
+
+    formatter.feed("rld</p><p>unclosed <b>")
+    formatter.close()
+
+    assert formatter.kirbytext == "\n\nhello\n\n"
+
+
+def test_excerpt_not_complete():
+    formatter = HTML2Kirby(excerpt_blocks=3)
+    formatter.feed("<p>a</p><p>b</p>")
+    formatter.close()
+
+    assert not formatter.excerpt_complete
+
+
+def test_excerpt_reset():
+    formatter = HTML2Kirby(excerpt_chars=10)
+    formatter._reset()
+
+    assert formatter.excerpt_chars == 10
+
+
+def test_cli_excerpt(tmpdir, capsys):
+    html = tmpdir.join("page.html")
+    html.write("<h1>Heading</h1><p>Text</p>")
+
+    main(["convert", "--excerpt-blocks", "1", str(html)])
+
+    assert capsys.readouterr().out == "# Heading\n\n"
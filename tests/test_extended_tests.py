@@ -2,7 +2,7 @@ import pytest
 import glob
 import os
 
-from html2kirby import HTML2Kirby
+from html2kirby import HTML2Kirby, convert
 
 files = []
 
@@ -28,3 +28,23 @@ def test_file(html, kirby):
         expected_result = kirby_file.read()
 
     assert formatter.kirbytext.strip() == expected_result.strip()
+
+
+@pytest.mark.parametrize("chunk_size", [1, 7, 64, 4096])
+@pytest.mark.parametrize("html,kirby", files)
+def test_file_chunked(html, kirby, chunk_size):
+    """The result must not depend on how the html is split into chunks"""
+    formatter = HTML2Kirby()
+
+    with open(html, 'r') as html_file:
+        html = html_file.read()
+
+    for i in range(0, len(html), chunk_size):
+        formatter.feed(html[i:i + chunk_size])
+    formatter.close()
+
+    with open(kirby, 'r') as kirby_file:
+        expected_result = kirby_file.read()
+
+    assert formatter.kirbytext.strip() == expected_result.strip()
+    assert formatter.kirbytext == convert(html)
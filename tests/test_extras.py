@@ -0,0 +1,110 @@
+import glob
+import os
+
+import pytest
+
+from html2kirby import FragmentCache, HTML2Kirby
+
+path = os.path.dirname(os.path.abspath(__file__))
+fixtures = sorted(glob.glob(os.path.join(path, "extended_tests/*.html")))
+
+
+def extras(html, **options):
+    formatter = HTML2Kirby(collect_extras=True, **options)
+    formatter.feed(html)
+    formatter.close()
+
+    return formatter
+
+
+def test_plaintext():
+    formatter = extras(
+        "<h1>Title &amp; more</h1>"
+        "<p>Some <b>bold</b> <i>text</i>,\n  and a <a href='/x'>link</a>.</p>"
+        "<ul><li>one</li><li>two</li></ul>"
+        "<script>var skipped;</script><p>end</p>"
+    )
+
+    assert formatter.plaintext == (
+        "Title & more\nSome bold text, and a link.\none\ntwo\nend\n")
+
+
+def test_plaintext_passthrough():
+    formatter = extras("<table><tr><td>a &lt;1&gt;</td>"
+                       "<td>b</td></tr></table>")
+
+    assert formatter.plaintext == "a <1>\nb\n"
+
+
+def test_images_and_links():
+    formatter = extras(
+        "<p><a href='/page'>page</a> <img src='inline.png'></p>"
+        "<a href='/big'><img src='thumb.jpg' alt='thumb'></a>"
+        "<a>no target</a>"
+        "<table><tr><td><a href='/cell'><img src='cell.gif'></a></td></tr>"
+        "</table>"
+    )
+
+    assert formatter.images == ['inline.png', 'thumb.jpg', 'cell.gif']
+    assert formatter.links == ['/page', '/big', '/cell']
+
+
+def test_extras_disabled():
+    formatter = HTML2Kirby()
+    formatter.feed("<p><a href='/page'><img src='a.png'></a> text</p>")
+    formatter.close()
+
+    assert formatter.plaintext == ""
+    assert formatter.images == []
+    assert formatter.links == []
+
+
+@pytest.mark.parametrize("html", fixtures)
+def test_extras_same_kirbytext(html):
+    with open(html, 'r') as f:
+        content = f.read()
+
+    formatter = HTML2Kirby()
+    formatter.feed(content)
+    formatter.close()
+
+    assert extras(content).kirbytext == formatter.kirbytext
+
+
+@pytest.mark.parametrize("html", fixtures)
+def test_extras_chunked(html):
+    with open(html, 'r') as f:
+        content = f.read()
+
+    expected = extras(content)
+
+    formatter = HTML2Kirby(collect_extras=True)
+    for i in range(0, len(content), 7):
+        formatter.feed(content[i:i + 7])
+    formatter.close()
+
+    assert formatter.plaintext == expected.plaintext
+    assert formatter.images == expected.images
+    assert formatter.links == expected.links
+
+
+def test_extras_fragment_cache():
+    html = "<div><a href='/shared'>{}</a></div>".format("x" * 300)
+    cache = FragmentCache()
+
+    for _ in range(3):
+        formatter = extras(html, fragment_cache=cache)
+
+        assert formatter.links == ['/shared']
+        assert formatter.plaintext == "x" * 300 + "\n"
+
+    assert len(cache) == 0
+
+
+def test_extras_reset():
+    formatter = HTML2Kirby(collect_extras=True)
+    formatter.feed("<a href='/x'>x</a>")
+    formatter._reset()
+
+    assert formatter.collect_extras
+    assert formatter.links == []
@@ -0,0 +1,112 @@
+import glob
+import os
+
+import pytest
+
+from html2kirby import FragmentCache, convert
+
+path = os.path.dirname(os.path.abspath(__file__))
+fixtures = sorted(glob.glob(os.path.join(path, "extended_tests/*.html")))
+
+footer = """<div class="footer"><p>Share this <a href="https://liip.ch">
+<img src="share.svg" alt="share"></a></p><ul><li>Imprint</li>
+<li>Contact <b>us</b></li></ul></div>"""
+
+
+@pytest.mark.parametrize("html", fixtures)
+def test_cached_fixtures(html):
+    with open(html, 'r') as html_file:
+        html = html_file.read()
+
+    cache = FragmentCache(min_fragment_size=0)
+    expected = convert(html)
+
+    for _ in range(3):
+        assert convert(html, fragment_cache=cache) == expected
+
+
+@pytest.mark.parametrize("before", [
+    "", "text", "text ", "<p>paragraph</p>", "<ul><li>item", "<b>bold",
+])
+def test_cached_fragment_context(before):
+    cache = FragmentCache(min_fragment_size=0)
+    html = before + footer + "<table><tr><td>1</td></tr></table> after"
+
+    for _ in range(3):
+        assert convert(html, fragment_cache=cache) == convert(html)
+
+    assert cache.hits > 0
+
+
+def test_cache_stats():
+    cache = FragmentCache(min_fragment_size=0)
+    html = "<div><p>Share this</p></div>"
+
+    # The first time a fragment is seen, it's parsed as usual
+    convert(html, fragment_cache=cache)
+
+    assert cache.stats['misses'] == 1
+    assert cache.stats['fragments'] == 0
+
+    convert(html, fragment_cache=cache)
+    convert(html, fragment_cache=cache)
+
+    assert cache.stats['misses'] == 2
+    assert cache.stats['hits'] == 1
+    assert cache.stats['hit_rate'] == 1 / 3
+    assert cache.stats['fragments'] == 1
+
+
+def test_fragment_size_limits():
+    cache = FragmentCache(max_fragment_size=100)
+
+    for _ in range(3):
+        convert("<div>short</div>" + footer, fragment_cache=cache)
+
+    assert cache.stats['misses'] == 0
+
+
+def test_eviction():
+    cache = FragmentCache(maxsize=2, min_fragment_size=0)
+    html = "<div>one</div><div>two</div><div>three</div>"
+
+    convert(html * 3, fragment_cache=cache)
+
+    assert len(cache) == 2
+    assert cache.evictions == 1
+
+
+def test_not_self_contained():
+    """Unclosed tags leave a state behind and can't be cached"""
+    cache = FragmentCache(min_fragment_size=0)
+    html = "<div><b>bold</div><p>after</p>"
+
+    assert convert(html + html, fragment_cache=cache) == convert(html + html)
+    assert len(cache) == 0
+
+
+def test_nested_fragments_not_looked_up():
+    cache = FragmentCache(min_fragment_size=0)
+    html = "<div><section><div><p>deep</p></div></section></div>"
+
+    for _ in range(2):
+        convert(html, fragment_cache=cache)
+
+    stats = cache.stats
+    assert convert(html, fragment_cache=cache) == convert(html)
+
+    # the outer div is a hit, the blocks in it aren't looked up
+    assert cache.stats['hits'] == stats['hits'] + 1
+    assert cache.stats['misses'] == stats['misses']
+
+
+def test_wrapped_pages():
+    """Blocks in a wrapper that isn't cached are looked up"""
+    cache = FragmentCache(min_fragment_size=0)
+    pages = ['<div id="page"><p>article {}</p>{}</div>'.format(i, footer)
+             for i in range(5)]
+
+    for html in pages:
+        assert convert(html, fragment_cache=cache) == convert(html)
+
+    assert cache.stats['hits'] == 3
@@ -137,6 +137,19 @@ def test_nested_lists(formatter):
     assert exp == formatter.kirbytext.strip()
 
 
+def test_deeply_nested_lists(formatter):
+    """Every level is indented by four more spaces"""
+    formatter.feed("<ul><li>a<ul><li>b<ul><li>c<ul><li>d</li></ul></li></ul>"
+                   "</li></ul></li></ul>")
+
+    exp = """* a
+    * b
+        * c
+            * d"""
+
+    assert exp == formatter.kirbytext.strip()
+
+
 def test_complicated_lists(formatter):
     formatter.feed("""
         <ul>
@@ -418,3 +431,81 @@ def test_nested_passthrouh(formatter):
     formatter.feed(_str)
 
     assert _str == formatter.kirbytext
+
+
+def test_skip_script(formatter):
+    formatter.feed("""<p>Before</p><script>if (a < b && c) {
+    document.write("<script><\\/script><b>bold</b>");
+}</script><p>After</p>""")
+
+    assert formatter.kirbytext == "\n\nBefore\n\nAfter\n\n"
+
+
+def test_skip_nested(formatter):
+    formatter.feed("""<noscript><noscript><b>foo</b></noscript>
+<style>b { color: red }</style></noscript>text""")
+
+    assert formatter.kirbytext == "text"
+
+
+def test_skip_chunked(formatter):
+    """The end of the skipped tag isn't in the buffer yet"""
+    formatter.feed("<p>Before</p><iframe><p>Frame")
+    formatter.feed("</p></iframe>After")
+
+    assert formatter.kirbytext == "\n\nBefore\n\nAfter"
+
+
+def test_skip_passthrough(formatter):
+    """Skip tags are kept in passthrough mode"""
+    _str = """<svg><style>path { fill: red }</style></svg>"""
+
+    formatter.feed(_str)
+
+    assert _str == formatter.kirbytext
+
+
+def test_skip_head_without_end_tag(formatter):
+    formatter.feed("<html><head><title>T</title><meta charset='utf-8'>"
+                   "<body><p>Hello <b>world</b></p></body></html>")
+
+    assert formatter.kirbytext == "\n\nHello **world** \n\n"
+
+
+def test_skip_head_without_body(formatter):
+    """The head ends before the first tag that can't be in it"""
+    formatter.feed("<head><title>T</title>")
+    formatter.feed("<style>p {}</style><p>Hello</p>")
+
+    assert formatter.kirbytext == "\n\nHello\n\n"
+
+
+def test_skip_comment(formatter):
+    """End tags in comments don't end the skipped tag"""
+    formatter.feed("<noscript><!-- </noscript> --><b>x</b></noscript>after")
+
+    assert formatter.kirbytext == "after"
+
+
+def test_skip_comment_chunked(formatter):
+    formatter.feed("<noscript><!-- </noscript>")
+    formatter.feed(" --><b>x</b></noscript>after")
+
+    assert formatter.kirbytext == "after"
+
+
+def test_skip_head_chunked(formatter):
+    """The head ends at the first tag that can't be in it, also when
+    </head> is already in the buffer
+    """
+    html = "<html><head><title>T</title><p>x</p></head><body>y</body></html>"
+
+    formatter.feed(html)
+
+    assert formatter.kirbytext == "\n\nx\n\ny"
+
+    formatter._reset()
+    for char in html:
+        formatter.feed(char)
+
+    assert formatter.kirbytext == "\n\nx\n\ny"
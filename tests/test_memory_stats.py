@@ -0,0 +1,104 @@
+import json
+import tracemalloc
+
+import pytest
+
+from html2kirby import HTML2Kirby
+from html2kirby.cli import main
+
+
+def test_memory_stats():
+    formatter = HTML2Kirby(track_memory=True)
+    formatter.feed("<ul><li>First <b>{}</b></li></ul>".format("x" * 50000))
+    formatter.close()
+
+    stats = formatter.memory_stats
+
+    assert stats.max_stack_depth == 3
+    assert stats.max_frame_size == len("* First **{}**\n".format("x" * 50000))
+    assert stats.output_size == len(formatter.kirbytext)
+    assert stats.peak_memory >= 50000
+
+
+def test_memory_stats_untracked():
+    formatter = HTML2Kirby()
+    formatter.feed("<p>some <em>paragraph</em></p>")
+
+    stats = formatter.memory_stats
+
+    assert stats.peak_memory == 0
+    assert stats.max_stack_depth == 1
+    assert stats.output_size == len(formatter.kirbytext)
+
+
+def test_memory_stats_reset():
+    formatter = HTML2Kirby(track_memory=True)
+    formatter._reset()
+
+    assert formatter.track_memory
+
+
+def test_cli_memory_stats(tmpdir, capsys):
+    html = tmpdir.join("page.html")
+    html.write("<h1>Heading</h1>")
+
+    main(["convert", "--memory-stats", "-d", str(tmpdir), str(html)])
+
+    stats = json.loads(capsys.readouterr().err)
+
+    assert stats["file"] == str(html)
+    assert stats["output_size"] == len("# Heading\n\n")
+    assert tmpdir.join("page.txt").read() == "# Heading\n\n"
+
+
+def test_memory_trace_stopped_without_close():
+    formatter = HTML2Kirby(track_memory=True)
+    formatter.feed("<p>{}</p>".format("x" * 50000))
+
+    assert not tracemalloc.is_tracing()
+    assert formatter.memory_stats.peak_memory >= 50000
+
+
+def test_memory_trace_chunks():
+    # the memory kept by earlier chunks counts towards the peak
+    formatter = HTML2Kirby(track_memory=True)
+    formatter.feed("<ul><li>{}".format("x" * 50000))
+    formatter.feed("{}</li></ul>".format("y" * 50000))
+    formatter.close()
+
+    assert formatter.memory_stats.peak_memory >= 100000
+
+
+def test_memory_trace_without_reset_peak(monkeypatch):
+    monkeypatch.delattr(tracemalloc, 'reset_peak', raising=False)
+
+    tracemalloc.start()
+    try:
+        # a large peak from before the conversion
+        data = ["x" * 10 ** 6 for _ in range(10)]
+        del data
+
+        formatter = HTML2Kirby(track_memory=True)
+        formatter.feed("<p>short</p>")
+        formatter.close()
+    finally:
+        tracemalloc.stop()
+
+    assert formatter.memory_stats.peak_memory < 10 ** 6
+
+
+def test_memory_trace_stopped_on_error():
+    formatter = HTML2Kirby(track_memory=True)
+
+    with pytest.raises(IndexError):
+        formatter.feed("<p>x</b> y")
+
+    assert not tracemalloc.is_tracing()
+
+    formatter = HTML2Kirby(track_memory=True)
+    formatter.feed("<p>x <b>y")
+
+    with pytest.raises(KeyError):
+        formatter.feed("</ul>")
+
+    assert not tracemalloc.is_tracing()
@@ -0,0 +1,81 @@
+import os
+
+import pytest
+
+from html2kirby.cli import main
+from html2kirby.pack import PackReader, PackWriter, convert_pack
+
+path = os.path.dirname(os.path.abspath(__file__))
+fixtures = os.path.join(path, "extended_tests")
+
+
+def test_pack_roundtrip(tmpdir):
+    pack = str(tmpdir.join("documents.pack"))
+
+    with PackWriter(pack) as writer:
+        writer.add("one.html", "<b>one</b>")
+        writer.add("sub/two.html", "<p>zwei – two</p>".encode('utf-8'))
+        writer.add("empty.html", "")
+
+    with PackReader(pack) as reader:
+        assert len(reader) == 3
+        assert reader[1][0] == "sub/two.html"
+        assert bytes(reader[0][1]) == b"<b>one</b>"
+        assert reader.text("sub/two.html") == "<p>zwei – two</p>"
+        assert reader.text(2) == ""
+
+
+def test_empty_pack(tmpdir):
+    pack = str(tmpdir.join("empty.pack"))
+
+    PackWriter(pack).close()
+
+    with PackReader(pack) as reader:
+        assert list(reader) == []
+
+
+def test_cli(tmpdir):
+    html_pack = str(tmpdir.join("html.pack"))
+    kirby_pack = str(tmpdir.join("kirby.pack"))
+    output = tmpdir.join("output")
+
+    main(["pack", fixtures, html_pack])
+    main(["convert-pack", "--fragment-cache", html_pack, kirby_pack])
+    main(["unpack", kirby_pack, str(output)])
+
+    converted = sorted(f.basename for f in output.listdir())
+    expected = sorted(f for f in os.listdir(fixtures) if f.endswith(".txt"))
+
+    assert converted == expected
+
+    for filename in converted:
+        with open(os.path.join(fixtures, filename)) as f:
+            assert output.join(filename).read().strip() == f.read().strip()
+
+
+def test_convert_pack_errors(tmpdir, caplog):
+    html_pack = str(tmpdir.join("html.pack"))
+    kirby_pack = str(tmpdir.join("kirby.pack"))
+
+    with PackWriter(html_pack) as writer:
+        writer.add("one.html", "<b>one</b>")
+        writer.add("broken.html", "<p>x</b> y")
+        writer.add("three.html", "<i>three</i>")
+
+    assert convert_pack(html_pack, kirby_pack) == 2
+    assert "Can't convert broken.html" in caplog.text
+
+    with PackReader(kirby_pack) as reader:
+        assert [name for name, _ in reader] == ["one.txt", "three.txt"]
+        assert reader.text("three.txt") == "_three_"
+
+
+def test_writer_error(tmpdir):
+    pack = tmpdir.join("documents.pack")
+
+    with pytest.raises(RuntimeError):
+        with PackWriter(str(pack)) as writer:
+            writer.add("one.html", "<b>one</b>")
+            raise RuntimeError
+
+    assert tmpdir.listdir() == []
@@ -0,0 +1,131 @@
+import io
+import json
+
+import pytest
+
+from html2kirby import HTML2Kirby
+from html2kirby.replay import Anonymizer, Recorder, load, replay
+
+html = """<p class="intro">Call 079 123 <a href="/secret?id=42">Anna</a></p>
+<!-- internal note --><img src=photo.jpg alt='Anna & Bob'><p>1 < 2</p>"""
+
+
+def test_anonymizer():
+    anonymized = Anonymizer().feed(html)
+
+    assert len(anonymized) == len(html)
+    assert anonymized.startswith(
+        '<p class="xxxxx">xxxx 000 000 <a href="/xxxxxx?xx=00">xxxx</a></p>')
+    assert "<!-- xxxxxxxx xxxx -->" in anonymized
+    assert "<img src=xxxxx.xxx alt='xxxx & xxx'>" in anonymized
+    assert anonymized.endswith("<p>0 < 0</p>")
+
+
+def test_anonymizer_chunks():
+    anonymizer = Anonymizer()
+    chunks = [html[i:i + 3] for i in range(0, len(html), 3)]
+
+    assert "".join(anonymizer.feed(c) for c in chunks) == (
+        Anonymizer().feed(html))
+
+
+def test_record(tmpdir):
+    path = str(tmpdir.join("session.jsonl"))
+
+    formatter = Recorder(HTML2Kirby(), path)
+    formatter.feed("<b>bo")
+    formatter.feed("ld</b>")
+    formatter.close()
+
+    assert formatter.kirbytext == "**bold** "
+
+    header, calls = load(path)
+
+    assert header['profile'] == "html2kirby.html2kirby.HTML2Kirby"
+    assert calls == [
+        {'call': 'feed', 'data': "<b>bo"},
+        {'call': 'feed', 'data': "ld</b>"},
+        {'call': 'close'},
+    ]
+
+
+def test_record_anonymized():
+    stream = io.StringIO()
+
+    formatter = Recorder(HTML2Kirby(), stream, anonymize=True)
+    formatter.feed("<b>Sec")
+    formatter.feed("ret</b>")
+
+    calls = [json.loads(line) for line in stream.getvalue().splitlines()]
+
+    assert calls[0]['anonymized']
+    assert [c['data'] for c in calls[1:]] == ["<b>xxx", "xxx</b>"]
+
+
+def test_replay(tmpdir):
+    path = str(tmpdir.join("session.jsonl"))
+
+    formatter = Recorder(HTML2Kirby(), path)
+    for i in range(0, len(html), 16):
+        formatter.feed(html[i:i + 16])
+    formatter.close()
+
+    report = replay(path, repeat=2)
+    stats = report.as_dict()
+
+    assert report.kirbytext == formatter.kirbytext
+    assert stats['feed_calls'] == len(range(0, len(html), 16))
+    assert stats['calls'] == stats['feed_calls'] + 1
+    assert stats['size'] == len(html)
+
+
+def test_anonymizer_script():
+    script = ("<script type='text/javascript'>"
+              "for(i=0;i<items.length;i++){send(secretToken)}</SCRIPT>")
+    html = "<p>Hi</p>{}<style>.secret {{}}</style><p>Ho</p>".format(script)
+    anonymizer = Anonymizer()
+    anonymized = "".join(anonymizer.feed(html[i:i + 5])
+                         for i in range(0, len(html), 5))
+
+    assert anonymized == (
+        "<p>xx</p><script type='xxxx/xxxxxxxxxx'>"
+        "xxx(x=0;x<xxxxx.xxxxxx;x++){xxxx(xxxxxxxxxxx)}</SCRIPT>"
+        "<style>.xxxxxx {}</style><p>xx</p>")
+
+
+class NoTables(HTML2Kirby):
+    passthrough_tags = ('svg',)
+
+
+def test_replay_profile(tmpdir):
+    path = str(tmpdir.join("session.jsonl"))
+
+    html = "<table><tr><td><b>bold</b></td></tr></table>"
+
+    formatter = Recorder(NoTables(), path)
+    formatter.feed(html)
+    formatter.close()
+
+    assert load(path)[0]['profile'] == "tests.test_replay.NoTables"
+    assert replay(path).kirbytext == "**bold** "
+    assert replay(path, profile=HTML2Kirby).kirbytext == html
+
+
+def test_replay_missing_profile(tmpdir):
+    path = tmpdir.join("session.jsonl")
+    path.write('{"version": 1, "profile": "nowhere.Missing"}\n'
+               '{"call": "feed", "data": "<b>bold</b>"}\n'
+               '{"call": "close"}\n')
+
+    assert replay(str(path)).kirbytext == "**bold** "
+
+
+@pytest.mark.parametrize("profile", ["builtins.print", "os.system",
+                                     "html2kirby.replay.Anonymizer"])
+def test_replay_not_a_profile(tmpdir, profile):
+    path = tmpdir.join("session.jsonl")
+    path.write(json.dumps({"version": 1, "profile": profile}) + '\n'
+               '{"call": "feed", "data": "<b>bold</b>"}\n'
+               '{"call": "close"}\n')
+
+    assert replay(str(path)).kirbytext == "**bold** "
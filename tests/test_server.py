@@ -0,0 +1,170 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+from concurrent.futures import TimeoutError
+
+import pytest
+
+from html2kirby.server import _convert_documents, make_server
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = make_server(port=0, workers=1, batch_size=2)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+    thread.join()
+
+
+@pytest.fixture
+def connection(server):
+    connection = http.client.HTTPConnection(*server.server_address)
+    yield connection
+    connection.close()
+
+
+def request(connection, method, path, body=None):
+    connection.request(method, path, body=body)
+    response = connection.getresponse()
+
+    return response.status, response.read().decode('utf-8')
+
+
+def test_convert(connection):
+    status, body = request(connection, 'POST', '/convert', "<b>bold</b>")
+
+    assert status == 200
+    assert body == "**bold** "
+
+    # the connection is kept alive
+    status, body = request(connection, 'POST', '/convert', "<h1>Title</h1>")
+
+    assert status == 200
+    assert body == "# Title\n\n"
+
+
+def test_batch(connection):
+    documents = ["<b>bold</b>", "<i>emph</i>", "<h1>Title</h1>"]
+    status, body = request(connection, 'POST', '/batch',
+                           json.dumps(documents))
+
+    assert status == 200
+    assert json.loads(body) == ["**bold** ", "_emph_", "# Title\n\n"]
+
+
+def test_bad_batch(connection):
+    status, _ = request(connection, 'POST', '/batch', '{"html": "<b>"}')
+
+    assert status == 400
+
+
+def test_not_found(connection):
+    status, _ = request(connection, 'GET', '/convert')
+
+    assert status == 404
+
+
+def test_stats(connection):
+    request(connection, 'POST', '/convert', "<b>bold</b>")
+    status, body = request(connection, 'GET', '/stats')
+
+    stats = json.loads(body)
+
+    assert status == 200
+    assert stats['documents'] >= 1
+    assert stats['latency_ms']['max'] >= stats['latency_ms']['p50'] > 0
+
+
+@pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'),
+                    reason="Unix sockets aren't supported")
+def test_unix_socket(tmpdir):
+    path = str(tmpdir.join('html2kirby.sock'))
+    server = make_server(socket_path=path, workers=1)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        client = socket.socket(socket.AF_UNIX)
+        client.connect(path)
+        client.sendall(b"POST /convert HTTP/1.1\r\nHost: localhost\r\n"
+                       b"Content-Length: 11\r\nConnection: close\r\n\r\n"
+                       b"<b>bold</b>")
+        response = b"".join(iter(lambda: client.recv(4096), b""))
+        client.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    assert response.startswith(b"HTTP/1.1 200")
+    assert response.endswith(b"\r\n\r\n**bold** ")
+    assert not os.path.exists(path)
+
+
+@pytest.mark.parametrize("length", ["-1", "eleven"])
+def test_bad_content_length(server, length):
+    connection = http.client.HTTPConnection(*server.server_address)
+    connection.putrequest('POST', '/convert')
+    connection.putheader('Content-Length', length)
+    connection.endheaders()
+
+    response = connection.getresponse()
+    connection.close()
+
+    assert response.status == 400
+
+
+def test_timeout_frees_worker():
+    server = make_server(port=0, workers=1, timeout=0.5)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.start()
+
+    try:
+        slow = http.client.HTTPConnection(*server.server_address)
+        status, _ = request(slow, 'POST', '/convert',
+                            "<p>x <b>y</b></p>" * 100000)
+        slow.close()
+
+        assert status == 504
+
+        connection = http.client.HTTPConnection(*server.server_address)
+        start = time.monotonic()
+        status, body = request(connection, 'POST', '/convert', "<b>bold</b>")
+        connection.close()
+    finally:
+        server.shutdown()
+        server.server_close()
+        thread.join()
+
+    assert status == 200
+    assert body == "**bold** "
+    # the slow conversion takes several seconds, it isn't waited for
+    assert time.monotonic() - start < 3
+
+
+def test_queued_timeout_keeps_workers():
+    server = make_server(port=0, workers=1, timeout=0.3)
+    slow = ["<p>x <b>y</b></p>" * 15000]
+
+    try:
+        pool = server.pool
+        # keep the worker and the call queue busy, so the request waits in
+        # the queue
+        busy = [pool.submit(_convert_documents, slow) for _ in range(2)]
+
+        with pytest.raises(TimeoutError):
+            server.convert(["<b>bold</b>"])
+
+        assert server.pool is pool
+        assert not any(future.done() for future in busy)
+    finally:
+        server.restart_pool(server.pool)
+        server.server_close()
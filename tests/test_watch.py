@@ -0,0 +1,110 @@
+import os
+
+import pytest
+
+from html2kirby.watch import Watcher
+
+
+@pytest.fixture
+def watcher(tmpdir):
+    watcher = Watcher(str(tmpdir.mkdir("html")), str(tmpdir.join("kirby")),
+                      workers=1)
+    yield watcher
+    watcher.close()
+
+
+def touch(path, content, mtime):
+    path.write(content, ensure=True)
+    os.utime(str(path), (mtime, mtime))
+
+
+def test_watch(tmpdir, watcher):
+    html = tmpdir.join("html")
+    kirby = tmpdir.join("kirby")
+
+    touch(html.join("one.html"), "<b>one</b>", 1000)
+    touch(html.join("sub", "two.html"), "<i>two</i>", 1000)
+    touch(html.join("notes.md"), "not html", 1000)
+
+    assert watcher.update(watcher.start()) == sorted([
+        str(html.join("one.html")), str(html.join("sub", "two.html"))
+    ])
+    assert kirby.join("one.txt").read() == "**one** "
+    assert kirby.join("sub", "two.txt").read() == "_two_"
+
+    # saved without changing the content
+    touch(html.join("one.html"), "<b>one</b>", 2000)
+    touch(html.join("sub", "two.html"), "<i>zwei</i>", 2000)
+
+    changed, deleted = watcher.poll()
+
+    assert watcher.update(changed, deleted) == [
+        str(html.join("sub", "two.html"))
+    ]
+    assert kirby.join("sub", "two.txt").read() == "_zwei_"
+
+    html.join("one.html").remove()
+
+    assert watcher.update(*watcher.poll()) == []
+    assert not kirby.join("one.txt").exists()
+
+
+def test_start_up_to_date(tmpdir, watcher):
+    html = tmpdir.join("html")
+    kirby = tmpdir.join("kirby")
+
+    touch(html.join("old.html"), "<b>old</b>", 1000)
+    touch(kirby.join("old.txt"), "**old** ", 2000)
+    touch(html.join("new.html"), "<b>new</b>", 3000)
+
+    assert watcher.start() == {str(html.join("new.html"))}
+
+
+def test_debounce(tmpdir, watcher):
+    html = tmpdir.join("html")
+    watcher.interval = watcher.debounce = 0.01
+    watcher.start()
+
+    touch(html.join("one.html"), "<b>one</b>", 1000)
+
+    assert watcher.wait_for_changes() == ({str(html.join("one.html"))}, set())
+
+
+def test_update_errors(tmpdir, watcher):
+    html = tmpdir.join("html")
+    kirby = tmpdir.join("kirby")
+
+    html.join("latin1.html").write_binary("<b>caf\xe9</b>".encode('latin1'))
+    touch(html.join("broken.html"), "<p>x</p></ul>", 1000)
+    touch(html.join("good.html"), "<b>good</b>", 1000)
+
+    assert watcher.update(watcher.start()) == [str(html.join("good.html"))]
+    assert kirby.join("good.txt").read() == "**good** "
+    assert not kirby.join("broken.txt").exists()
+
+    # the files that failed are converted once they're fixed
+    html.join("latin1.html").write_text("<b>café</b>", "utf-8")
+    touch(html.join("broken.html"), "<p>x</p>", 2000)
+
+    assert watcher.update(*watcher.poll()) == sorted([
+        str(html.join("broken.html")), str(html.join("latin1.html"))
+    ])
+
+
+def test_start_deleted(tmpdir, watcher, monkeypatch):
+    html = tmpdir.join("html")
+    kirby = tmpdir.join("kirby")
+
+    touch(html.join("gone.html"), "<b>gone</b>", 1000)
+    touch(kirby.join("gone.txt"), "**gone** ", 2000)
+
+    scan = watcher.scan
+
+    def scan_and_delete():
+        stats = scan()
+        html.join("gone.html").remove()
+        return stats
+
+    monkeypatch.setattr(watcher, 'scan', scan_and_delete)
+
+    assert watcher.start() == set()